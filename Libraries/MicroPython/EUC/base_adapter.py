@@ -1,18 +1,395 @@
 # micropython/euc/base_adapter.py
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+from .ring_buffer import RingBuffer
+from .telemetry import Telemetry
+from .battery import BatteryCurve, resolve_pack
+from errors import EUCParseError, EUCCommandError
+
+def _find(mv, pattern, pos, end):
+    """Posizione della prima occorrenza di pattern in mv[pos:end], o -1, senza copiare mv."""
+    n = len(pattern)
+    first = pattern[0]
+    last = end - n
+    while pos <= last:
+        if mv[pos] == first:
+            j = 1
+            while j < n and mv[pos + j] == pattern[j]:
+                j += 1
+            if j == n:
+                return pos
+        pos += 1
+    return -1
+
 class BaseAdapter:
+    BUFFER_SIZE = 80  # Capacità del buffer di ricezione in byte, ridefinibile per adattatore
+    HEADER = b""  # Byte iniziali di ogni pacchetto, definiti da ciascun adattatore
+    FRAME_LENGTH = 20  # Lunghezza fissa del pacchetto, se _frame_length() non è ridefinito
+    LIVE_LAYOUT = None  # Layout dei dati live (vedi layout.py), definito da ciascun adattatore
+    VOLTAGE_CONFIGS = None  # Configurazioni dei pacchi batteria, per il riconoscimento dalla tensione
+    COMMANDS = None  # Codici dei comandi {nome: codice}, definiti da ciascun adattatore
+    COMMAND_TEMPLATE = b""  # Pacchetto di comando con i soli byte fissi (header, terminatore)
+    COMMAND_OFFSET = 0  # Posizione del codice comando; i parametri lo seguono
+    COMMAND_CHECKSUM = None  # Posizione della checksum (somma dei byte precedenti), se prevista
+    # Comandi di impostazione o richiesta: se uno è ancora in coda, il nuovo lo sostituisce
+    COALESCE = ("pedals_mode", "lights", "pedal_angle", "ride_mode", "tiltback_alert",
+                "serial_data", "status", "live_data")
+    # Valori ammessi dai comandi comuni, ridefinibili per adattatore
+    PEDALS_MODES = (0, 1, 2)
+    RIDE_MODES = (0, 1, 2)
+    PEDAL_ANGLE_RANGE = (-5.0, 5.0)  # Gradi
+    ALERT_LEVELS = ()  # Livelli dell'allarme acustico (set_speed_alert)
+    SPEED_LIMITS = ()  # Velocità discrete in km/h per allarmi e tilt-back
+
     def __init__(self, ble):
         self.ble = ble
-        self.speed = 0
-        self.battery = 0
-        self.distance = 0
-        self.buffer = bytearray()
-    
-    def _check_buffer_size(self):
-        if len(self.buffer) > 100:
-            self.buffer = bytearray()
-    
+        self.telemetry = Telemetry(self.LIVE_LAYOUT) if self.LIVE_LAYOUT else None
+        self.pack = None  # Configurazione del pacco batteria, fissata dal modello o riconosciuta dalla tensione
+        self._pack_candidates = None  # Pacchi ancora compatibili con le tensioni lette, () se pack è certo
+        self._battery_curve = None
+        self.buffer = RingBuffer(self.BUFFER_SIZE)
+        self.resync_bytes = 0  # Byte scartati cercando un header valido
+        self.bad_frames = 0  # Pacchetti scartati per lunghezza o checksum non validi
+        self.bulk_bad_frames = 0  # Pacchetti scartati dall'ultima decode_many()
+        self._build_command_templates()
+
+    # Ultimi valori live, letti dal record di telemetria
+    @property
+    def speed(self):
+        return self.telemetry["speed"]
+
+    @property
+    def battery(self):
+        return self.telemetry["battery"]
+
+    @property
+    def distance(self):
+        return self.telemetry["distance"]
+
+    @property
+    def temperature(self):
+        return self.telemetry["temperature"]
+
+    @property
+    def current(self):
+        return self.telemetry["current"]
+
+    def feed(self, data):
+        """Accoda i byte ricevuti (es. da una notifica BLE) senza parsarli.
+
+        Se il buffer è pieno i byte in eccesso vengono scartati e conteggiati
+        in self.buffer.overflow_bytes.
+        """
+        self.buffer.write(data)
+
     def decode(self, data):
-        raise NotImplementedError("Il metodo decode deve essere implementato.")
+        """Accoda i byte ricevuti e restituisce il pacchetto decodificato, se completo."""
+        self.feed(data)
+        return self.poll()
+
+    def poll(self):
+        """Restituisce il prossimo pacchetto valido presente nel buffer, o None se servono altri byte.
+
+        I byte che precedono un header valido vengono scartati; un pacchetto con lunghezza
+        o checksum non validi costa solo il suo header, dopo il quale la ricerca riprende.
+        I pacchetti successivi restano nel buffer per le chiamate seguenti.
+        """
+        buf = self.buffer
+        while self._sync():
+            length = self._frame_length(buf)
+            if length is None:
+                return None
+            if length > buf.capacity:
+                # Lunghezza impossibile: header falso, si riprende dal byte successivo
+                self.bad_frames += 1
+                buf.consume(1)
+                continue
+            if len(buf) < length:
+                return None
+            frame = buf.view(0, length)
+            if not self._check_frame(frame):
+                self.bad_frames += 1
+                buf.consume(1)
+                continue
+            try:
+                return self._parse_frame(frame)
+            finally:
+                buf.consume(length)
+        return None
+
+    def frames(self):
+        """Generatore che restituisce tutti i pacchetti completi presenti nel buffer."""
+        while True:
+            result = self.poll()
+            if result is None:
+                return
+            yield result
+
+    def decode_many(self, buf, out):
+        """Decodifica tutti i pacchetti contenuti in buf (bytes, bytearray o memoryview) e li scrive in out.
+
+        out può essere una lista, a cui si aggiunge un dict per ogni pacchetto (per i dati
+        live una copia del record di telemetria), oppure un dict di colonne {campo: lista o
+        array}, a cui si aggiunge il valore di ogni campo dei pacchetti di dati live.
+        La decodifica avviene in una copia dell'adattatore (vedi _clone()): buffer, record
+        di telemetria, pacco batteria e contatori dell'adattatore connesso restano intatti.
+        Un eventuale pacchetto incompleto in coda a buf viene ignorato. Restituisce il numero
+        di pacchetti decodificati; quelli scartati sono conteggiati in bulk_bad_frames.
+        """
+        decoder = self._clone()
+        mv = memoryview(buf)
+        find = buf.find if isinstance(buf, (bytes, bytearray)) else None  # memoryview non ha find()
+        header = self.HEADER
+        end = len(mv)
+        capacity = decoder.buffer.capacity
+        columns = out if isinstance(out, dict) else None
+        count = 0
+        bad = 0
+        pos = 0
+        while True:
+            start = find(header, pos) if find else _find(mv, header, pos, end)
+            if start < 0:
+                break
+            length = decoder._frame_length(mv, start)
+            if length is None:
+                break
+            if length > capacity:
+                # Lunghezza impossibile: header falso, come in poll() si riprende dal byte successivo
+                bad += 1
+                pos = start + 1
+                continue
+            if start + length > end:
+                # Supera la fine di buf: è il pacchetto troncato in coda solo se dopo il suo
+                # header non c'è un pacchetto completo, quindi si prosegue la ricerca
+                pos = start + 1
+                continue
+            frame = mv[start:start + length]
+            if not decoder._check_frame(frame):
+                bad += 1
+                pos = start + 1
+                continue
+            pos = start + length
+            try:
+                result = decoder._parse_frame(frame)
+            except EUCParseError:
+                bad += 1
+                continue
+            count += 1
+            if columns is None:
+                out.append(result.snapshot() if result is decoder.telemetry else result)
+            elif result is decoder.telemetry:
+                for name, column in columns.items():
+                    column.append(result[name])
+        self.bulk_bad_frames = bad
+        return count
+
+    def _clone(self):
+        """Nuovo adattatore della stessa marca e modello, senza BLE: usato da decode_many()."""
+        return type(self)(None)
+
+    def _sync(self):
+        """Allinea la testa del buffer al primo header. Restituisce False se non ce n'è uno completo."""
+        buf = self.buffer
+        index = buf.find(self.HEADER)
+        if index < 0:
+            # Conserva la coda: potrebbe contenere l'inizio di un header spezzato tra due notifiche
+            drop = len(buf) - (len(self.HEADER) - 1)
+            if drop > 0:
+                self.resync_bytes += drop
+                buf.consume(drop)
+            return False
+        if index:
+            self.resync_bytes += index
+            buf.consume(index)
+        return True
+
+    def _build_command_templates(self):
+        """Prepara un modello immutabile per ogni comando e il buffer di appoggio in cui completarlo.
+
+        Ogni modello è (byte del pacchetto, posizione dei parametri, somma dei byte fissi).
+        """
+        self._templates = {}
+        checksum = self.COMMAND_CHECKSUM
+        for name, code in (self.COMMANDS or {}).items():
+            template = bytearray(self.COMMAND_TEMPLATE)
+            template[self.COMMAND_OFFSET] = code
+            total = sum(template[:checksum]) if checksum is not None else 0
+            self._templates[name] = (bytes(template), self.COMMAND_OFFSET + 1, total)
+        self._command = bytearray(len(self.COMMAND_TEMPLATE))
+        self._command_mv = memoryview(self._command)
+
+    def _send_command(self, name, fmt=None, value=0, value2=None):
+        """Invia il comando name con i parametri value (e value2) codificati secondo il formato struct fmt.
+
+        Il modello viene copiato nel buffer di appoggio e i parametri scritti sul posto con
+        pack_into; la checksum parte dalla somma precalcolata e aggiunge i soli byte dei
+        parametri. L'invio non alloca: raffiche di comandi (clacson, luci) non attivano il GC.
+        """
+        if name not in self._templates:
+            raise EUCCommandError(f"Comando non supportato: {name}")
+        template, offset, total = self._templates[name]
+        command = self._command
+        self._command_mv[:] = template
+        if fmt:
+            if value2 is None:
+                struct.pack_into(fmt, command, offset, value)
+            else:
+                struct.pack_into(fmt, command, offset, value, value2)
+        checksum = self.COMMAND_CHECKSUM
+        if checksum is not None:
+            if fmt:
+                for i in range(offset, offset + struct.calcsize(fmt)):
+                    total += command[i]
+            command[checksum] = total & 0xFF
+        self.ble.write(command, name, name in self.COALESCE)
+
+    def _set_pack(self, config, certain=True):
+        """Imposta la configurazione del pacco batteria e precalcola la sua tabella SoC."""
+        if certain:
+            self._pack_candidates = ()
+        if config is not self.pack:
+            self.pack = config
+            self._battery_curve = BatteryCurve(config)
+
+    def _calculate_battery(self):
+        """Percentuale della batteria dalla tensione dell'ultimo pacchetto live.
+
+        Se il pacco non è noto viene riconosciuto dalla tensione, tra i VOLTAGE_CONFIGS il cui
+        intervallo min-max la contiene. Dove gli intervalli si sovrappongono (es. 63-67.2 V tra
+        16S e 20S) la scelta resta provvisoria e ogni pacchetto scarta i pacchi incompatibili,
+        finché ne resta uno solo.
+        """
+        telemetry = self.telemetry
+        raw = telemetry.raw[telemetry.slot("voltage")]
+        divisor = telemetry.divisor("voltage")
+        if self._pack_candidates != ():
+            if not self.VOLTAGE_CONFIGS:
+                return 0
+            candidates = self._pack_candidates or tuple(self.VOLTAGE_CONFIGS.values())
+            candidates, config = resolve_pack(candidates, raw / divisor)
+            self._pack_candidates = candidates
+            self._set_pack(config, len(candidates) == 1)
+        return self._battery_curve.soc(raw, divisor)
+
+    def _frame_length(self, buf, start=0):
+        """Lunghezza del pacchetto che inizia in buf[start], o None se non ancora determinabile.
+
+        buf è il RingBuffer (da poll(), con start 0) o la memoryview dell'intera cattura (da decode_many()).
+        """
+        return self.FRAME_LENGTH
+
+    def _check_frame(self, frame):
+        """Verifica l'integrità del pacchetto (es. checksum). Di default accetta ogni pacchetto."""
+        return True
+
+    def _parse_frame(self, frame):
+        raise NotImplementedError("Il metodo _parse_frame deve essere implementato.")
+
+    def _check_speed(self, speed):
+        """Verifica che speed sia tra le velocità discrete SPEED_LIMITS dell'adattatore."""
+        if not self.SPEED_LIMITS:
+            raise EUCCommandError("Velocità discrete non previste per questo EUC.")
+        if speed not in self.SPEED_LIMITS:
+            valid_speeds = ", ".join(map(str, self.SPEED_LIMITS))
+            raise EUCCommandError(f"Velocità non valida: {speed}. Valori consentiti: {valid_speeds}")
+
+    def update_pedals_mode(self, mode):
+        """Imposta modalità pedalata (PEDALS_MODES, di default 0: hard, 1: medium, 2: soft)."""
+        try:
+            if mode not in self.PEDALS_MODES:
+                raise EUCCommandError(f"Modalità pedali non valida: {mode}")
+            self._send_command("pedals_mode", "B", mode)
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando modalità pedali: {e}")
+
+    def set_lights(self, state):
+        """Accende (1) o spegne (0) le luci."""
+        try:
+            if state not in [0, 1]:
+                raise EUCCommandError(f"Stato luci non valido: {state}")
+            self._send_command("lights", "B", state)
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando luci: {e}")
+
+    def start_calibration(self):
+        """Avvia la calibrazione del giroscopio (ipotetico, da verificare)."""
+        try:
+            self._send_command("calibration", "B", 1)
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando calibrazione: {e}")
+
+    def set_speed_alert(self, level):
+        """Imposta allarme acustico (ALERT_LEVELS, es. 0: disattivato, 1: primo livello, 2: secondo livello)."""
+        try:
+            if level not in self.ALERT_LEVELS:
+                valid_levels = ", ".join(map(str, self.ALERT_LEVELS))
+                raise EUCCommandError(f"Livello allarme non valido: {level}. Valori consentiti: {valid_levels}")
+            self._send_command("speed_alert", "B", level)
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando allarme velocità: {e}")
+
+    def set_speed_alert_with_speed(self, level, speed):
+        """Imposta allarme velocità con soglia specifica tra SPEED_LIMITS (ipotetico, da verificare)."""
+        try:
+            if level not in [1, 2, 3]:
+                raise EUCCommandError(f"Livello allarme non valido: {level}")
+            self._check_speed(speed)
+            speed_value = int(speed * 100)  # Convertito in 0.01 km/h
+            self._send_command("speed_alert", ">BH", level, speed_value)
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando allarme velocità con soglia: {e}")
+
+    def set_pedal_angle(self, angle):
+        """Imposta l'angolo delle pedane (gradi, entro PEDAL_ANGLE_RANGE)."""
+        try:
+            min_angle, max_angle = self.PEDAL_ANGLE_RANGE
+            if not (min_angle <= angle <= max_angle):
+                raise EUCCommandError(f"Angolo pedane non valido: {angle}")
+            angle_value = int(angle * 100)  # Convertito in 0.01°
+            self._send_command("pedal_angle", ">h", angle_value)
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando angolo pedane: {e}")
+
+    def activate_horn(self):
+        """Attiva il clacson."""
+        try:
+            self._send_command("horn", "B", 1)
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando clacson: {e}")
+
+    def request_serial_data(self):
+        """Richiede il numero di serie dell'EUC."""
+        try:
+            self._send_command("serial_data", "B", 1)
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando dati seriali: {e}")
+
+    def set_ride_mode(self, mode):
+        """Imposta modalità di guida (RIDE_MODES, di default 0: eco, 1: normale, 2: sport)."""
+        try:
+            if mode not in self.RIDE_MODES:
+                raise EUCCommandError(f"Modalità di guida non valida: {mode}")
+            self._send_command("ride_mode", "B", mode)
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando modalità di guida: {e}")
+
+    def set_tiltback_alert(self, speed):
+        """Imposta allarme tilt-back, con velocità tra SPEED_LIMITS (ipotetico, da verificare)."""
+        try:
+            self._check_speed(speed)
+            speed_value = int(speed * 100)  # Convertito in 0.01 km/h
+            self._send_command("tiltback_alert", ">H", speed_value)
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando tilt-back: {e}")
+
+    def request_status(self):
+        """Richiede informazioni sullo stato (es. versione firmware)."""
+        try:
+            self._send_command("status", "B", 1)
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando stato: {e}")
 
     def get_serial_number(self):
         raise NotImplementedError("Il metodo get_serial_number deve essere implementato.")
@@ -0,0 +1,71 @@
+# micropython/euc/battery.py
+
+# Curva di scarica tipica di una cella Li-ion (NMC/NCA) a riposo: (mV, SoC %)
+_CELL_CURVE = (
+    (3150, 0), (3300, 3), (3400, 7), (3500, 14), (3600, 26), (3700, 42),
+    (3800, 58), (3900, 72), (4000, 83), (4100, 92), (4200, 100)
+)
+_LUT_STEPS = 64  # Intervalli della tabella tra tensione minima e massima del pacco
+
+
+def _curve_soc(cell_mv):
+    """SoC (%) della curva di riferimento per una tensione di cella in mV (usato solo per costruire le tabelle)."""
+    if cell_mv <= _CELL_CURVE[0][0]:
+        return 0
+    for i in range(1, len(_CELL_CURVE)):
+        mv, soc = _CELL_CURVE[i]
+        if cell_mv <= mv:
+            prev_mv, prev_soc = _CELL_CURVE[i - 1]
+            return prev_soc + (soc - prev_soc) * (cell_mv - prev_mv) / (mv - prev_mv)
+    return 100
+
+
+def resolve_pack(candidates, voltage):
+    """Restringe i pacchi candidati a quelli il cui intervallo min_voltage-max_voltage contiene voltage.
+
+    Restituisce (candidati, pacco): i candidati restano invariati se la tensione non cade in
+    nessun intervallo (es. lettura anomala); il pacco è, tra i candidati, quello con tensione
+    massima più vicina a voltage. Con un solo candidato il pacco è certo.
+    """
+    kept = 0
+    for config in candidates:
+        if config["min_voltage"] <= voltage <= config["max_voltage"]:
+            kept += 1
+    if kept and kept < len(candidates):
+        candidates = tuple(config for config in candidates
+                           if config["min_voltage"] <= voltage <= config["max_voltage"])
+    best = None
+    for config in candidates:
+        if best is None or abs(voltage - config["max_voltage"]) < abs(voltage - best["max_voltage"]):
+            best = config
+    return candidates, best
+
+
+class BatteryCurve:
+    """Tabella SoC precalcolata per una configurazione di pacco batteria.
+
+    La curva di riferimento viene adattata all'intervallo min_voltage-max_voltage del
+    pacco e campionata in _LUT_STEPS + 1 punti. A ogni pacchetto il SoC si ottiene con
+    un accesso alla tabella e un'interpolazione lineare in aritmetica intera.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.min_mv = int(config["min_voltage"] * 1000 + 0.5)
+        self.span_mv = int(config["max_voltage"] * 1000 + 0.5) - self.min_mv
+        self._lut = bytearray(_LUT_STEPS + 1)
+        ref_span = _CELL_CURVE[-1][0] - _CELL_CURVE[0][0]
+        for i in range(_LUT_STEPS + 1):
+            self._lut[i] = int(_curve_soc(_CELL_CURVE[0][0] + ref_span * i / _LUT_STEPS) + 0.5)
+
+    def soc(self, raw_voltage, divisor=1):
+        """SoC (%) intero per una tensione del pacco espressa come raw_voltage / divisor volt."""
+        offset = raw_voltage * 1000 // divisor - self.min_mv
+        if offset <= 0:
+            return 0
+        if offset >= self.span_mv:
+            return 100
+        scaled = offset * _LUT_STEPS
+        i = scaled // self.span_mv
+        low = self._lut[i]
+        return low + (self._lut[i + 1] - low) * (scaled - i * self.span_mv) // self.span_mv
@@ -0,0 +1,77 @@
+# micropython/euc/gotway_constants.py
+# Tabelle Gotway/Begode, caricate solo con l'adattatore (vedi BLEManager.select_adapter)
+
+CHAR_UUID = "0000FFF1-0000-1000-8000-00805F9B34FB"
+
+# Campi dei dati live (vedi layout.py)
+LIVE_DATA_FIELDS = (
+    ("voltage", 2, 2, False, 10),
+    ("speed", 4, 2, True, 10),
+    ("distance", 6, 4, False, 1000),
+    ("current", 10, 2, True, 10),
+    ("temperature", 12, 2, False, 10)
+)
+
+# Informazioni sulle tensioni Begode
+VOLTAGE_CONFIGS = {
+    67.2: {  # 16S: MTen3, MCM5
+        "cells": 16,
+        "max_voltage": 67.2,  # 4.2V * 16
+        "min_voltage": 50.4,  # 3.15V * 16
+        "low_battery_alarm": 52.0,  # 3.25V * 16
+        "low_battery_tiltback": 50.4,  # 3.15V * 16
+        "supports_low_battery_mode": False
+    },
+    84.0: {  # 20S: Tesla, MSuper V3, RS
+        "cells": 20,
+        "max_voltage": 84.0,  # 4.2V * 20
+        "min_voltage": 63.0,  # 3.15V * 20
+        "low_battery_alarm": 65.0,  # 3.25V * 20
+        "low_battery_tiltback": 63.0,  # 3.15V * 20
+        "supports_low_battery_mode": True  # RS supporta modalità batteria scarica
+    },
+    100.8: {  # 24S: Nikola, EX, Monster, T4
+        "cells": 24,
+        "max_voltage": 100.8,  # 4.2V * 24
+        "min_voltage": 75.6,  # 3.15V * 24
+        "low_battery_alarm": 78.0,  # 3.25V * 24
+        "low_battery_tiltback": 75.6,  # 3.15V * 24
+        "supports_low_battery_mode": True  # Nikola, T4 supportano modalità batteria scarica
+    },
+    134.4: {  # 32S: Master, EX.N, Extreme
+        "cells": 32,
+        "max_voltage": 134.4,  # 4.2V * 32
+        "min_voltage": 100.8,  # 3.15V * 32
+        "low_battery_alarm": 104.0,  # 3.25V * 32
+        "low_battery_tiltback": 100.8,  # 3.15V * 32
+        "supports_low_battery_mode": True  # Master supporta modalità batteria scarica
+    },
+    168.0: {  # 40S: X-Way
+        "cells": 40,
+        "max_voltage": 168.0,  # 4.2V * 40
+        "min_voltage": 126.0,  # 3.15V * 40
+        "low_battery_alarm": 130.0,  # 3.25V * 40
+        "low_battery_tiltback": 126.0,  # 3.15V * 40
+        "supports_low_battery_mode": True  # X-Way supporta modalità batteria scarica
+    }
+}
+
+# Codici comandi Gotway/Begode
+COMMANDS = {
+    "pedals_mode": 0xF1,
+    "lights": 0x73,
+    "calibration": 0xF7,
+    "speed_alert": 0xF5,
+    "pedal_angle": 0xF6,
+    "horn": 0x88,
+    "serial_data": 0x1B,
+    "ride_mode": 0xF3,
+    "tiltback_alert": 0xF8,
+    "status": 0x1A
+}
+
+# Livelli dell'allarme acustico Gotway/Begode (0: disattivato, 1: primo livello, 2: secondo livello)
+ALERT_LEVELS = (0, 1, 2)
+
+# Velocità consentite per allarmi e tilt-back Gotway/Begode (km/h, valori discreti da verificare)
+SPEED_LIMITS = (10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70)
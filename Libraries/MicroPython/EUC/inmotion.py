@@ -1,222 +1,259 @@
 # micropython/euc/inmotion.py
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
 from .base_adapter import BaseAdapter
-from constants import INMOTION_SERVICE_UUID, INMOTION_WRITE_UUID, INMOTION_NOTIFY_UUID, INMOTION_COMMANDS, INMOTION_VOLTAGE_CONFIGS, RESPONSE_TYPES
+from .layout import Layout
+from .inmotion_constants import (COMMANDS, LIVE_DATA_FIELDS, MODEL_PACKS, NOTIFY_UUID, VOLTAGE_CONFIGS,
+                                 WRITE_SERVICE_UUID, WRITE_UUID)
+from constants import INMOTION_SERVICE_UUID
 from errors import EUCParseError, EUCCommandError
+from micropython import const
+
+_ESCAPE = const(0xA5)  # Precede i byte AA, 55 e A5 contenuti nel pacchetto
+_EXTENDED = const(0xFE)  # Lunghezza che indica dati estesi dopo l'intestazione CAN
+_CAN_HEADER = const(16)  # Id (4), dati (8), lunghezza, canale, formato, tipo
+_FAST_INFO = const(0x0F550113)  # Dati live
+_SLOW_INFO = const(0x0F550114)  # Numero di serie e firmware
 
 class InmotionAdapter(BaseAdapter):
+    """Adattatore per EUC InMotion con protocollo a messaggi CAN (V5, V8, V10).
+
+    Ogni messaggio è racchiuso tra AA AA e 55 55; i byte AA, 55 e A5 al suo interno sono
+    preceduti da A5 e l'ultimo byte (senza escape) è la somma dei precedenti. Un messaggio
+    arriva spezzato su più notifiche e la sua lunghezza si conosce solo al terminatore.
+    """
+    HEADER = b"\xAA\xAA"
+    BUFFER_SIZE = 512  # GetFastInfo occupa circa 190 byte con gli escape, su una decina di notifiche
+    LIVE_LAYOUT = Layout(LIVE_DATA_FIELDS, big_endian=False)
+    VOLTAGE_CONFIGS = VOLTAGE_CONFIGS
+    COMMANDS = COMMANDS  # Valori (id, byte fissi, lunghezza, canale): vedi _build_command_templates
+
     def __init__(self, ble, model="V10F"):
         super().__init__(ble)
         self.service_uuid = INMOTION_SERVICE_UUID
-        self.write_uuid = INMOTION_WRITE_UUID
-        self.notify_uuid = INMOTION_NOTIFY_UUID
-        self.temperature = 0
-        self.current = 0
+        self.write_service_uuid = WRITE_SERVICE_UUID
+        self.write_uuid = WRITE_UUID
+        self.notify_uuid = NOTIFY_UUID
         self.serial_number = None
         self.firmware_version = None
         self.model = model
-        self.voltage_config = INMOTION_VOLTAGE_CONFIGS.get(model, INMOTION_VOLTAGE_CONFIGS["default"])
+        pack = MODEL_PACKS.get(model)
+        self.voltage_config = VOLTAGE_CONFIGS[pack or 84.0]  # Modello sconosciuto: limiti del 20S
         self.max_speed = self.voltage_config["max_speed"]
+        if pack:
+            self._set_pack(self.voltage_config)  # Altrimenti il pacco viene riconosciuto dalla tensione
+        # Messaggio senza escape ricomposto da _check_frame e letto da _parse_frame
+        self._payload = bytearray(self.BUFFER_SIZE)
+        self._payload_mv = memoryview(self._payload)
+        self._payload_len = 0
+        # Ricerca del terminatore interrotta da poll() per mancanza di byte: riprende da _scan_pos
+        # finché la testa del buffer resta _scan_head (lo stesso pacchetto)
+        self._scan_pos = 2
+        self._scan_head = -1
+
+    def _clone(self):
+        """Nuovo adattatore dello stesso modello, senza BLE (vedi BaseAdapter._clone)."""
+        return type(self)(None, self.model)
+
+    def _frame_length(self, buf, start=0):
+        """Lunghezza del pacchetto fino al terminatore 55 55 non preceduto da un escape.
 
-    def decode(self, data):
-        """Parsa i dati ricevuti da un EUC InMotion."""
+        Un AA AA senza escape prima del terminatore indica un pacchetto troncato: la lunghezza
+        restituita si ferma lì e il pacchetto viene scartato da _check_frame. La ricerca si
+        ferma alla capacità del buffer, oltre la quale un pacchetto non può arrivare.
+        Su self.buffer riprende dal punto in cui si era fermata alla chiamata precedente: un
+        messaggio che arriva su molte notifiche viene letto una sola volta.
+        """
+        capacity = self.buffer.capacity
+        n = min(len(buf) - start, capacity)
+        i = 2
+        incremental = buf is self.buffer
+        if incremental and buf.head == self._scan_head:
+            i = self._scan_pos
+        self._scan_head = -1
+        while i < n - 1:
+            b = buf[start + i]
+            if b == _ESCAPE:
+                i += 2  # Il byte successivo è un dato, qualunque valore abbia
+                continue
+            if b == 0x55 and buf[start + i + 1] == 0x55:
+                return i + 2
+            if b == 0xAA and buf[start + i + 1] == 0xAA:
+                return i
+            i += 1
+        if n >= capacity:
+            return capacity + 1  # Nessun terminatore in un buffer pieno: header falso
+        if incremental:
+            self._scan_head = buf.head
+            self._scan_pos = i
+        return None
+
+    def _check_frame(self, frame):
+        """Toglie gli escape dal messaggio (in self._payload) e ne verifica la checksum."""
+        end = len(frame) - 2
+        if end < 2 or frame[end] != 0x55 or frame[end + 1] != 0x55:
+            return False
+        payload = self._payload
+        n = 0
+        i = 2
+        while i < end:
+            b = frame[i]
+            if b == _ESCAPE:
+                i += 1
+                if i == end:
+                    return False
+                b = frame[i]
+            payload[n] = b
+            n += 1
+            i += 1
+        if n <= _CAN_HEADER:
+            return False
+        self._payload_len = n
+        n -= 1
+        return sum(self._payload_mv[:n]) & 0xFF == payload[n]
+
+    def _parse_frame(self, frame):
+        """Parsa un messaggio InMotion già privato degli escape da _check_frame."""
         try:
-            self._check_buffer_size()
-            self.buffer.extend(data)
-            if len(self.buffer) < 20:
-                return None
-            if self.buffer[0] != 0xAA or self.buffer[1] != 0x55:
-                self.buffer = bytearray()
-                raise EUCParseError("Header pacchetto InMotion non valido.")
-            
-            response_type = self.buffer[16]
-            result = {}
-
-            if response_type == RESPONSE_TYPES["InMotion"]["live_data"]:  # Dati live
-                speed = ((self.buffer[4] << 8 | self.buffer[5]) / 100.0)
-                if speed > 327.67:
-                    speed -= 655.36
-                voltage = (self.buffer[2] << 8 | self.buffer[3]) / 100.0
-                distance = (self.buffer[12] << 24 | self.buffer[13] << 16 |
-                           self.buffer[14] << 8 | self.buffer[15]) / 1000.0
-                temperature = (self.buffer[8] << 8 | self.buffer[9]) / 100.0
-                current = ((self.buffer[6] << 8 | self.buffer[7]) / 100.0)
-                if current > 327.67:
-                    current -= 655.36
-                
-                battery = self._calculate_battery(voltage)
-                
-                self.speed = speed
-                self.battery = battery
-                self.distance = distance
-                self.temperature = temperature
-                self.current = current
-                
-                result = {
-                    "speed": speed,
-                    "battery": battery,
-                    "distance": distance,
-                    "temperature": temperature,
-                    "current": current,
-                    "voltage": voltage
-                }
-
-            elif response_type == RESPONSE_TYPES["InMotion"]["serial_data"]:  # Numero di serie
-                serial = "".join(chr(b) for b in self.buffer[2:16] if b != 0)
-                self.serial_number = serial
-                result = {"serial_number": serial}
+            payload = self._payload_mv
+            message_id = struct.unpack_from("<I", payload, 0)[0]
+            if payload[12] == _EXTENDED:
+                length = struct.unpack_from("<I", payload, 4)[0]
+                if _CAN_HEADER + length != self._payload_len - 1:
+                    raise EUCParseError(f"Lunghezza dei dati estesi InMotion non valida: {length}")
+                data = payload[_CAN_HEADER:_CAN_HEADER + length]
+            else:
+                data = payload[4:12]
 
-            elif response_type == RESPONSE_TYPES["InMotion"]["firmware"]:  # Firmware
-                major = self.buffer[2]
-                minor = self.buffer[3]
-                firmware = f"{major}.{minor}"
+            if message_id == _FAST_INFO:  # Dati live
+                if len(data) < self.LIVE_LAYOUT.size:
+                    raise EUCParseError("Messaggio GetFastInfo InMotion troppo corto.")
+                result = self.telemetry
+                self.LIVE_LAYOUT.unpack_into(data, result.raw)
+                result.set("battery", self._calculate_battery())
+                result.count += 1
+
+            elif message_id == _SLOW_INFO:  # Numero di serie e firmware
+                if len(data) < 28:
+                    raise EUCParseError("Messaggio GetSlowInfo InMotion troppo corto.")
+                serial = "".join("%02X" % data[i] for i in range(7, -1, -1))
+                firmware = f"{data[27]}.{data[26]}.{data[25] << 8 | data[24]}"
+                self.serial_number = serial
                 self.firmware_version = firmware
-                result = {"firmware_version": firmware}
+                result = {"serial_number": serial, "firmware_version": firmware}
 
             else:
-                raise EUCParseError(f"Tipo di risposta InMotion sconosciuto: {response_type}")
+                result = {"message_id": message_id}  # Messaggio valido ma non decodificato
 
-            self.buffer = bytearray()
             return result
 
         except IndexError:
-            self.buffer = bytearray()
             raise EUCParseError("Pacchetto InMotion incompleto o corrotto.")
         except Exception as e:
-            self.buffer = bytearray()
             raise EUCParseError(f"Errore parsing dati InMotion: {e}")
 
-def _calculate_battery(self, voltage):
-    """Calcola la percentuale della batteria per InMotion."""
-    for config in INMOTION_VOLTAGE_CONFIGS.values():
-        if abs(voltage - config["max_voltage"]) < 10.0:  # Tolleranza aumentata per 176V
-            max_voltage = config["max_voltage"]
-            min_voltage = config["min_voltage"]
-            return min(max(int((voltage - min_voltage) / (max_voltage - min_voltage) * 100), 0), 100)
-    return 0
-def update_pedals_mode(self, mode):
-    """Imposta modalità pedane (0: Commute, 1: Offroad)."""
-    try:
-        if mode not in [0, 1]:
-            raise EUCCommandError(f"Modalità pedane non valida: {mode}. Usa 0 (Commute) o 1 (Offroad).")
-        command = bytearray([0xAA, 0x55, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            INMOTION_COMMANDS["pedals_mode"], mode, 0x00, 0x00])
-        self.ble.write(command)
-    except Exception as e:
-        raise EUCCommandError(f"Errore invio comando modalità pedane: {e}")
-
-def set_lights(self, state):
-    """Accende (1) o spegne (0) le luci."""
-    try:
-        if state not in [0, 1]:
-            raise EUCCommandError(f"Stato luci non valido: {state}")
-        command = bytearray([0xAA, 0x55, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            INMOTION_COMMANDS["lights"], state, 0x00, 0x00])
-        self.ble.write(command)
-    except Exception as e:
-        raise EUCCommandError(f"Errore invio comando luci: {e}")
-
-def start_calibration(self):
-    """Avvia la calibrazione del giroscopio (ipotetico, da verificare)."""
-    try:
-        command = bytearray([0xAA, 0x55, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            INMOTION_COMMANDS["calibration"], 0x01, 0x00, 0x00])
-        self.ble.write(command)
-    except Exception as e:
-        raise EUCCommandError(f"Errore invio comando calibrazione: {e}")
-
-def set_speed_alert(self, speed):
-    """Imposta allarme velocità (continuo, fino a velocità massima)."""
-    try:
-        if not (0 <= speed <= self.max_speed):
-            raise EUCCommandError(f"Velocità non valida: {speed}. Deve essere tra 0 e {self.max_speed} km/h.")
-        speed_value = int(speed * 100)  # Convertito in 0.01 km/h
-        command = bytearray([0xAA, 0x55, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            INMOTION_COMMANDS["speed_alert"],
-                            speed_value >> 8, speed_value & 0xFF, 0x00])
-        self.ble.write(command)
-    except Exception as e:
-        raise EUCCommandError(f"Errore invio comando allarme velocità: {e}")
-
-def set_pedal_angle(self, angle):
-    """Imposta l'angolo delle pedane (gradi, -5.0 a +5.0)."""
-    try:
-        if not (-5.0 <= angle <= 5.0):
-            raise EUCCommandError(f"Angolo pedane non valido: {angle}. Deve essere tra -5.0 e +5.0 gradi.")
-        angle_value = int(angle * 100)  # Convertito in 0.01°
-        command = bytearray([0xAA, 0x55, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            INMOTION_COMMANDS["pedal_angle"],
-                            angle_value >> 8, angle_value & 0xFF, 0x00])
-        self.ble.write(command)
-    except Exception as e:
-        raise EUCCommandError(f"Errore invio comando angolo pedane: {e}")
-
-def activate_horn(self):
-    """Attiva il clacson tramite casse audio."""
-    try:
-        command = bytearray([0xAA, 0x55, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            INMOTION_COMMANDS["horn"], 0x01, 0x00, 0x00])
-        self.ble.write(command)
-    except Exception as e:
-        raise EUCCommandError(f"Errore invio comando clacson: {e}")
-
-def request_serial_data(self):
-    """Richiede il numero di serie dell'EUC."""
-    try:
-        command = bytearray([0xAA, 0x55, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            INMOTION_COMMANDS["serial_data"], 0x00, 0x00, 0x00])
-        self.ble.write(command)
-    except Exception as e:
-        raise EUCCommandError(f"Errore invio comando dati seriali: {e}")
-
-def set_ride_mode(self, mode):
-    """Imposta modalità di guida (0: eco, 1: normale, 2: sport, ipotetico)."""
-    try:
-        if mode not in [0, 1, 2]:
-            raise EUCCommandError(f"Modalità di guida non valida: {mode}")
-        command = bytearray([0xAA, 0x55, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            INMOTION_COMMANDS["ride_mode"], mode, 0x00, 0x00])
-        self.ble.write(command)
-    except Exception as e:
-        raise EUCCommandError(f"Errore invio comando modalità di guida: {e}")
-
-def set_tiltback_alert(self, speed):
-    """Imposta allarme tilt-back (ipotetico)."""
-    try:
-        if not (0 <= speed <= self.max_speed):
-            raise EUCCommandError(f"Velocità non valida: {speed}. Deve essere tra 0 e {self.max_speed} km/h.")
-        speed_value = int(speed * 100)  # Convertito in 0.01 km/h
-        command = bytearray([0xAA, 0x55, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            INMOTION_COMMANDS["tiltback_alert"],
-                            speed_value >> 8, speed_value & 0xFF, 0x00])
-        self.ble.write(command)
-    except Exception as e:
-        raise EUCCommandError(f"Errore invio comando tilt-back: {e}")
-
-def request_status(self):
-    """Richiede informazioni sullo stato (es. versione firmware)."""
-    try:
-        command = bytearray([0xAA, 0x55, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            INMOTION_COMMANDS["status"], 0x00, 0x00, 0x00])
-        self.ble.write(command)
-    except Exception as e:
-        raise EUCCommandError(f"Errore invio comando stato: {e}")
-
-def request_live_data(self):
-    """Richiede dati live (velocità, tensione, ecc.)."""
-    try:
-        command = bytearray([0xAA, 0x55, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                            INMOTION_COMMANDS["live_data"], 0x00, 0x00, 0x00])
-        self.ble.write(command)
-    except Exception as e:
-        raise EUCCommandError(f"Errore invio comando dati live: {e}")
+    def _build_command_templates(self):
+        """Prepara il corpo CAN di ogni comando (id, dati fissi, lunghezza, canale) e i buffer di appoggio."""
+        self._templates = {}
+        for name, (message_id, prefix, length, channel) in self.COMMANDS.items():
+            body = bytearray(_CAN_HEADER)
+            struct.pack_into("<I", body, 0, message_id)
+            body[4:4 + len(prefix)] = prefix
+            body[12] = length
+            body[13] = channel
+            self._templates[name] = (bytes(body), 4 + len(prefix), sum(body))
+        self._command = bytearray(_CAN_HEADER)
+        self._command_mv = memoryview(self._command)
+        # Caso peggiore: escape su ogni byte del corpo e della checksum
+        self._frame_out = bytearray(b"\xAA\xAA" + bytes(2 * (_CAN_HEADER + 1) + 2))
+        self._frame_out_mv = memoryview(self._frame_out)
+
+    def _send_command(self, name, fmt=None, value=0, value2=None):
+        """Completa il corpo CAN del comando con value (formato struct fmt) e lo invia.
+
+        Escape e checksum vengono scritti direttamente nel buffer di uscita preallocato.
+        """
+        template, offset, total = self._templates[name]
+        body = self._command
+        self._command_mv[:] = template
+        if fmt:
+            struct.pack_into(fmt, body, offset, value)
+            for i in range(offset, offset + struct.calcsize(fmt)):
+                total += body[i]
+        out = self._frame_out
+        n = 2
+        for i in range(_CAN_HEADER + 1):
+            b = body[i] if i < _CAN_HEADER else total & 0xFF
+            if b == 0xAA or b == 0x55 or b == _ESCAPE:
+                out[n] = _ESCAPE
+                n += 1
+            out[n] = b
+            n += 1
+        out[n] = 0x55
+        out[n + 1] = 0x55
+        self.ble.write(self._frame_out_mv[:n + 2], name, name in self.COALESCE)
+
+    def update_pedals_mode(self, mode):
+        """Imposta modalità pedane (0: Commute, 1: Offroad)."""
+        try:
+            if mode not in [0, 1]:
+                raise EUCCommandError(f"Modalità pedane non valida: {mode}. Usa 0 (Commute) o 1 (Offroad).")
+            self._send_command("pedals_mode", "<I", mode)
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando modalità pedane: {e}")
+
+    def start_calibration(self):
+        """Avvia la calibrazione del giroscopio (da verificare)."""
+        try:
+            self._send_command("calibration")
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando calibrazione: {e}")
+
+    def set_speed_alert(self, speed):
+        """Allarme velocità: non previsto dal protocollo CAN, la soglia è quella di tilt-back."""
+        raise EUCCommandError("Allarme velocità non disponibile su InMotion: usa set_tiltback_alert().")
+
+    def set_pedal_angle(self, angle):
+        """Imposta l'angolo delle pedane (gradi, -5.0 a +5.0)."""
+        try:
+            if not (-5.0 <= angle <= 5.0):
+                raise EUCCommandError(f"Angolo pedane non valido: {angle}. Deve essere tra -5.0 e +5.0 gradi.")
+            self._send_command("pedal_angle", "<i", int(angle * 65536))  # Stessa scala di pitch
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando angolo pedane: {e}")
+
+    def request_serial_data(self):
+        """Richiede numero di serie e versione firmware (messaggio GetSlowInfo)."""
+        try:
+            self._send_command("serial_data")
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando dati seriali: {e}")
+
+    def set_ride_mode(self, mode):
+        """Modalità di guida: sul protocollo CAN coincide con la modalità pedane."""
+        raise EUCCommandError("Modalità di guida non disponibile su InMotion: usa update_pedals_mode().")
+
+    def set_tiltback_alert(self, speed):
+        """Imposta la velocità massima (tilt-back), in km/h."""
+        try:
+            if not (0 <= speed <= self.max_speed):
+                raise EUCCommandError(f"Velocità non valida: {speed}. Deve essere tra 0 e {self.max_speed} km/h.")
+            self._send_command("tiltback_alert", "<I", int(speed * 1000))  # Convertito in m/h
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando tilt-back: {e}")
+
+    def request_status(self):
+        """Richiede informazioni sullo stato (versione firmware, messaggio GetSlowInfo)."""
+        try:
+            self._send_command("status")
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando stato: {e}")
+
+    def request_live_data(self):
+        """Richiede i dati live (messaggio GetFastInfo); la risposta arriva come notifica."""
+        try:
+            self._send_command("live_data")
+        except Exception as e:
+            raise EUCCommandError(f"Errore invio comando dati live: {e}")
@@ -0,0 +1,80 @@
+# micropython/euc/inmotion_constants.py
+# Tabelle InMotion, caricate solo con l'adattatore (vedi BLEManager.select_adapter)
+
+NOTIFY_UUID = "0000FFE4-0000-1000-8000-00805F9B34FB"
+WRITE_SERVICE_UUID = "0000FFE5-0000-1000-8000-00805F9B34FB"  # Scrittura in un servizio separato
+WRITE_UUID = "0000FFE9-0000-1000-8000-00805F9B34FB"
+
+# Campi dei dati live (vedi layout.py): dati estesi del messaggio GetFastInfo, little endian, verificati sulla cattura V10F
+LIVE_DATA_FIELDS = (
+    ("pitch", 0, 4, True, 65536),  # Gradi
+    ("speed", 12, 4, True, 3812 / 3.6),  # 3812 unità = 1 m/s (V5, V8, V10); negativa in avanti
+    ("current", 20, 4, True, 100),
+    ("voltage", 24, 4, False, 100),
+    ("temperature", 32, 1, False, 1),
+    ("temperature2", 34, 1, False, 1),
+    ("distance", 44, 4, False, 1000),  # Metri totali
+    ("trip", 48, 4, False, 1000)
+)
+
+# Informazioni sulle tensioni InMotion
+VOLTAGE_CONFIGS = {
+    67.2: {  # 16S: V5, V5F
+        "cells": 16,
+        "max_voltage": 67.2,  # 4.2V * 16
+        "min_voltage": 50.4,  # 3.15V * 16
+        "low_battery_alarm": 52.0,  # 3.25V * 16
+        "low_battery_tiltback": 50.4,  # 3.15V * 16
+        "supports_low_battery_mode": False,
+        "max_speed": 25.0
+    },
+    84.0: {  # 20S: V8, V8F, V8S, V10, V10F, V11, V12
+        "cells": 20,
+        "max_voltage": 84.0,  # 4.2V * 20
+        "min_voltage": 63.0,  # 3.15V * 20
+        "low_battery_alarm": 65.0,  # 3.25V * 20
+        "low_battery_tiltback": 63.0,  # 3.15V * 20
+        "supports_low_battery_mode": True,  # V11, V12 supportano modalità batteria scarica
+        "max_speed": 45.0  # V10F, V11
+    },
+    100.8: {  # 24S: V13
+        "cells": 24,
+        "max_voltage": 100.8,  # 4.2V * 24
+        "min_voltage": 75.6,  # 3.15V * 24
+        "low_battery_alarm": 78.0,  # 3.25V * 24
+        "low_battery_tiltback": 75.6,  # 3.15V * 24
+        "supports_low_battery_mode": True,  # V13 supporta modalità batteria scarica
+        "max_speed": 60.0
+    },
+    134.4: {  # 32S: V14 Adventure
+        "cells": 32,
+        "max_voltage": 134.4,  # 4.2V * 32
+        "min_voltage": 100.8,  # 3.15V * 32
+        "low_battery_alarm": 104.0,  # 3.25V * 32
+        "low_battery_tiltback": 100.8,  # 3.15V * 32
+        "supports_low_battery_mode": True,  # V14 supporta modalità batteria scarica
+        "max_speed": 50.0  # Ipotetico
+    }
+}
+
+# Tensione massima del pacco (chiave di VOLTAGE_CONFIGS) per modello InMotion
+MODEL_PACKS = {
+    "V5": 67.2, "V5F": 67.2,
+    "V8": 84.0, "V8F": 84.0, "V8S": 84.0, "V10": 84.0, "V10F": 84.0, "V11": 84.0, "V12": 84.0,
+    "V13": 100.8,
+    "V14": 134.4
+}
+
+# Comandi InMotion: (id del messaggio CAN, byte fissi iniziali dei dati, lunghezza, canale).
+# I parametri seguono i byte fissi. Id e sottocodici delle impostazioni come nei client open source, da verificare
+COMMANDS = {
+    "pedals_mode": (0x0F550115, b"\x0A\x00\x00\x00", 8, 10),  # RideMode: classic/comfort
+    "lights": (0x0F55010D, b"", 8, 5),
+    "calibration": (0x0F550119, b"\x32\x54\x76\x98", 8, 5),
+    "pedal_angle": (0x0F550115, b"\x00\x00\x00\x00", 8, 10),  # RideMode: inclinazione orizzonte
+    "horn": (0x0F550609, b"", 8, 5),  # PlaySound
+    "serial_data": (0x0F550114, b"\xFF" * 8, 1, 5),  # GetSlowInfo: numero di serie e firmware
+    "tiltback_alert": (0x0F550115, b"\x01\x00\x00\x00", 8, 10),  # RideMode: velocità massima
+    "status": (0x0F550114, b"\xFF" * 8, 1, 5),
+    "live_data": (0x0F550113, b"\xFF" * 8, 1, 5)  # GetFastInfo
+}
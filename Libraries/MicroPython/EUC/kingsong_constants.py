@@ -0,0 +1,77 @@
+# micropython/euc/kingsong_constants.py
+# Tabelle Kingsong, caricate solo con l'adattatore (vedi BLEManager.select_adapter)
+
+CHAR_UUID = "0000FFE1-0000-1000-8000-00805F9B34FB"
+
+# Campi dei dati live (vedi layout.py)
+LIVE_DATA_FIELDS = (
+    ("voltage", 2, 2, False, 10),
+    ("speed", 4, 2, True, 10),
+    ("distance", 6, 4, False, 1000),
+    ("current", 10, 2, True, 10),
+    ("temperature", 12, 2, False, 10)
+)
+
+# Informazioni sulle tensioni Kingsong
+VOLTAGE_CONFIGS = {
+    67.2: {  # 16S: 14S, 16S, N8, N10
+        "cells": 16,
+        "max_voltage": 67.2,  # 4.2V * 16
+        "min_voltage": 50.4,  # 3.15V * 16
+        "low_battery_alarm": 52.0,  # 3.25V * 16
+        "low_battery_tiltback": 50.4,  # 3.15V * 16
+        "supports_low_battery_mode": False
+    },
+    84.0: {  # 20S: 16X, 18L, 18XL, S18
+        "cells": 20,
+        "max_voltage": 84.0,  # 4.2V * 20
+        "min_voltage": 63.0,  # 3.15V * 20
+        "low_battery_alarm": 65.0,  # 3.25V * 20
+        "low_battery_tiltback": 63.0,  # 3.15V * 20
+        "supports_low_battery_mode": True  # S18 supporta modalità batteria scarica (display)
+    },
+    126.0: {  # 30S: S19 Pro, F-series (ipotetico)
+        "cells": 30,
+        "max_voltage": 126.0,  # 4.2V * 30
+        "min_voltage": 94.5,  # 3.15V * 30
+        "low_battery_alarm": 97.5,  # 3.25V * 30
+        "low_battery_tiltback": 94.5,  # 3.15V * 30
+        "supports_low_battery_mode": True  # S19 supporta modalità batteria scarica
+    },
+    134.4: {  # 32S: S22, S22 Pro
+        "cells": 32,
+        "max_voltage": 134.4,  # 4.2V * 32
+        "min_voltage": 100.8,  # 3.15V * 32
+        "low_battery_alarm": 104.0,  # 3.25V * 32
+        "low_battery_tiltback": 100.8,  # 3.15V * 32
+        "supports_low_battery_mode": True  # S22 supporta modalità batteria scarica (display)
+    },
+    176.4: {  # 42S: F22 Pro
+        "cells": 42,
+        "max_voltage": 176.4,  # 4.2V * 42
+        "min_voltage": 132.3,  # 3.15V * 42
+        "low_battery_alarm": 136.5,  # 3.25V * 42
+        "low_battery_tiltback": 132.3,  # 3.15V * 42
+        "supports_low_battery_mode": True  # F22 Pro ipoteticamente supporta modalità batteria scarica
+    }
+}
+
+# Codici comandi Kingsong
+COMMANDS = {
+    "pedals_mode": 0xF1,
+    "lights": 0x73,
+    "calibration": 0xF7,
+    "speed_alert": 0xF5,
+    "pedal_angle": 0xF6,
+    "horn": 0x88,
+    "serial_data": 0x63,
+    "ride_mode": 0xF3,
+    "tiltback_alert": 0xF8,
+    "status": 0x1A
+}
+
+# Livelli dell'allarme acustico Kingsong (0: disattivato, 1: primo livello, 2: secondo livello)
+ALERT_LEVELS = (0, 1, 2)
+
+# Velocità consentite per allarmi e tilt-back Kingsong (km/h, valori discreti da verificare)
+SPEED_LIMITS = (10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60)
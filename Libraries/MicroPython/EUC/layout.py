@@ -0,0 +1,101 @@
+# micropython/euc/layout.py
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+# Codici struct per (larghezza in byte, con segno)
+_CODES = {
+    (1, False): "B", (1, True): "b",
+    (2, False): "H", (2, True): "h",
+    (4, False): "I", (4, True): "i"
+}
+
+try:
+    struct.calcsize("2x")
+    _HAS_PAD = True
+except Exception:
+    _HAS_PAD = False  # Port senza byte di riempimento: i byte saltati vengono letti e ignorati
+
+# I campi dei dati live di ogni marca sono in EUC/<marca>_constants.py (LIVE_DATA_FIELDS):
+# (nome, offset, larghezza, con segno, divisore). Un sesto elemento True indica un campo
+# a 32 bit con le due parole da 16 bit invertite.
+
+
+class Layout:
+    """Layout dichiarativo di un pacchetto, compilato una sola volta in un formato struct.
+
+    Ogni pacchetto viene decodificato con un unico unpack_from, al posto delle
+    singole operazioni di shift e or sui byte.
+    """
+
+    def __init__(self, fields, big_endian=True):
+        fields = sorted(fields, key=lambda field: field[1])
+        fmt = ">" if big_endian else "<"
+        index = []
+        swapped = []
+        position = 0
+        slot = 0
+        for field in fields:
+            name, offset, width, signed, divisor = field[:5]
+            if offset < position:
+                raise ValueError(f"Campo {name} sovrapposto al precedente.")
+            gap = offset - position
+            if gap and _HAS_PAD:
+                fmt += f"{gap}x"
+            elif gap:
+                fmt += "B" * gap
+                slot += gap
+            if len(field) > 5 and field[5]:
+                if width != 4 or signed:
+                    raise ValueError(f"Il campo {name} a parole invertite deve essere a 32 bit senza segno.")
+                fmt += "HH"
+                swapped.append(len(index))
+                index.append(slot)
+                slot += 2
+            else:
+                code = _CODES.get((width, signed))
+                if code is None:
+                    raise ValueError(f"Larghezza non supportata per il campo {name}: {width}")
+                fmt += code
+                index.append(slot)
+                slot += 1
+            position = offset + width
+        self.format = fmt
+        self.size = position
+        self.names = tuple(field[0] for field in fields)
+        self.divisors = tuple(field[4] for field in fields)
+        self._index = tuple(index)
+        self._swapped = tuple(swapped)
+        self._direct = _HAS_PAD and not swapped  # Un valore per campo: la tupla è già il risultato
+
+    def unpack(self, frame):
+        """Restituisce i valori grezzi (non scalati) dei campi, nell'ordine di names."""
+        values = struct.unpack_from(self.format, frame)
+        if self._direct:
+            return values
+        raw = [values[i] for i in self._index]
+        for i in self._swapped:
+            slot = self._index[i]
+            raw[i] = values[slot + 1] << 16 | values[slot]
+        return raw
+
+    def unpack_into(self, frame, raw):
+        """Scrive i valori grezzi dei campi in raw (array preallocato), nell'ordine di names."""
+        values = struct.unpack_from(self.format, frame)
+        index = self._index
+        for i in range(len(index)):
+            raw[i] = values[index[i]]
+        for i in self._swapped:
+            slot = index[i]
+            raw[i] = values[slot + 1] << 16 | values[slot]
+
+    def decode(self, frame, out=None):
+        """Decodifica i campi già divisi per il loro divisore in out (un dict, creato se non indicato)."""
+        if out is None:
+            out = {}
+        values = self.unpack(frame)
+        divisors = self.divisors
+        for i, name in enumerate(self.names):
+            out[name] = values[i] / divisors[i]
+        return out
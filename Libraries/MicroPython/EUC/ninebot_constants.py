@@ -0,0 +1,35 @@
+# micropython/euc/ninebot_constants.py
+# Tabelle Ninebot, caricate solo con l'adattatore (vedi BLEManager.select_adapter)
+
+CHAR_UUID = "0000FFE1-0000-1000-8000-00805F9B34FB"
+
+# Campi dei dati live (vedi layout.py)
+LIVE_DATA_FIELDS = (
+    ("speed", 4, 2, True, 100),
+    ("voltage", 6, 2, False, 100),
+    ("current", 8, 2, True, 100),
+    ("temperature", 10, 2, False, 100),
+    ("distance", 12, 4, False, 1000)
+)
+
+# Informazioni sulle tensioni Ninebot
+VOLTAGE_CONFIGS = {
+    "One S2": {"cells": 15, "max_voltage": 63.0, "min_voltage": 50.4, "max_speed": 24.0, "pedal_angle_range": (-5.0, 5.0)},
+    "Z10": {"cells": 20, "max_voltage": 72.0, "min_voltage": 57.6, "max_speed": 45.0, "pedal_angle_range": (-5.0, 5.0)},
+    "default": {"cells": 15, "max_voltage": 63.0, "min_voltage": 50.4, "max_speed": 24.0, "pedal_angle_range": (-5.0, 5.0)}
+}
+
+# Codici comandi Ninebot
+COMMANDS = {
+    "pedals_mode": 0x09,
+    "lights": 0x07,
+    "calibration": 0x0A,
+    "speed_alert": 0x05,
+    "pedal_angle": 0x0B,
+    "horn": 0x08,
+    "serial_data": 0x03,
+    "ride_mode": 0x0C,
+    "tiltback_alert": 0x06,
+    "status": 0x04,
+    "live_data": 0x01
+}
@@ -0,0 +1,114 @@
+# micropython/euc/ring_buffer.py
+class RingBuffer:
+    """Buffer circolare a capacità fissa: i byte vengono scritti sul posto e letti tramite memoryview.
+
+    Un solo produttore (l'IRQ delle notifiche, che scrive in coda) e un solo consumatore
+    (il parsing, che legge dalla testa): ognuno aggiorna solo il proprio indice, quindi
+    non serve disabilitare le interruzioni. In caso di buffer pieno i byte in eccesso
+    vengono scartati e conteggiati in overflow_bytes/overflow_events.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._size = capacity + 1  # Uno slot resta sempre libero per distinguere pieno da vuoto
+        self._buf = bytearray(self._size)
+        self._mv = memoryview(self._buf)
+        self._scratch = bytearray(capacity)
+        self._scratch_mv = memoryview(self._scratch)
+        self._head = 0
+        self._tail = 0
+        self.overflow_bytes = 0
+        self.overflow_events = 0
+
+    def __len__(self):
+        return (self._tail - self._head) % self._size
+
+    def __getitem__(self, index):
+        """Restituisce il byte in posizione index a partire dalla testa del buffer."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Indice fuori dal buffer circolare.")
+        return self._buf[(self._head + index) % self._size]
+
+    @property
+    def head(self):
+        """Posizione della testa nel buffer: cambia a ogni consume() o clear() che scarta byte."""
+        return self._head
+
+    def free(self):
+        return self.capacity - len(self)
+
+    def write(self, data):
+        """Copia data in coda al buffer. Restituisce il numero di byte effettivamente scritti."""
+        n = len(data)
+        free = self.free()
+        if n > free:
+            self.overflow_bytes += n - free
+            self.overflow_events += 1
+            n = free
+        if n == 0:
+            return 0
+        tail = self._tail
+        first = self._size - tail
+        if n <= first and n == len(data):
+            self._mv[tail:tail + n] = data
+        else:
+            # Dati troncati o a cavallo della fine del buffer: copia per indice, perché una
+            # slice di data allocherebbe un nuovo oggetto nell'IRQ delle notifiche
+            buf = self._buf
+            if first > n:
+                first = n
+            for i in range(first):
+                buf[tail + i] = data[i]
+            for i in range(first, n):
+                buf[i - first] = data[i]
+        self._tail = (tail + n) % self._size
+        return n
+
+    def find(self, pattern, start=0):
+        """Restituisce la posizione (relativa alla testa) della prima occorrenza di pattern, o -1."""
+        buf = self._buf
+        size = self._size
+        head = self._head
+        n = len(pattern)
+        first = pattern[0]
+        last = len(self) - n
+        i = start
+        while i <= last:
+            if buf[(head + i) % size] == first:
+                j = 1
+                while j < n and buf[(head + i + j) % size] == pattern[j]:
+                    j += 1
+                if j == n:
+                    return i
+            i += 1
+        return -1
+
+    def view(self, start, length):
+        """Restituisce una memoryview di length byte a partire da start (relativo alla testa).
+
+        Se i dati sono contigui la vista punta direttamente nel buffer; se attraversano
+        la fine del buffer vengono ricomposti nel buffer di appoggio preallocato. La vista
+        resta valida fino alla successiva chiamata a consume() o view().
+        """
+        if start < 0 or length < 0 or start + length > len(self):
+            raise IndexError("Intervallo fuori dal buffer circolare.")
+        begin = (self._head + start) % self._size
+        end = begin + length
+        if end <= self._size:
+            return self._mv[begin:end]
+        first = self._size - begin
+        self._scratch_mv[:first] = self._mv[begin:]
+        self._scratch_mv[first:length] = self._mv[:length - first]
+        return self._scratch_mv[:length]
+
+    def consume(self, n):
+        """Scarta i primi n byte del buffer."""
+        if n > len(self):
+            n = len(self)
+        self._head = (self._head + n) % self._size
+
+    def clear(self):
+        """Scarta tutti i byte presenti, senza riallocare il buffer."""
+        self._head = self._tail
@@ -0,0 +1,57 @@
+# micropython/euc/telemetry.py
+from array import array
+
+
+class Telemetry:
+    """Record dei dati live posseduto dall'adattatore e aggiornato sul posto a ogni pacchetto.
+
+    I valori grezzi (interi, come letti dal pacchetto) sono in un array preallocato e
+    vengono divisi per il divisore del campo solo quando letti: la decodifica non crea
+    né dizionari né float. Si legge come un dict (record["speed"], "speed" in record);
+    chi deve conservare lo storico usa snapshot(), che restituisce una copia.
+    """
+
+    def __init__(self, layout, extra=("battery",)):
+        self.names = layout.names + extra
+        self._divisors = layout.divisors + (1,) * len(extra)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self.raw = array('q', bytes(8 * len(self.names)))
+        self.count = 0  # Pacchetti decodificati nel record
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __getitem__(self, name):
+        i = self._index[name]
+        divisor = self._divisors[i]
+        return self.raw[i] / divisor if divisor != 1 else self.raw[i]
+
+    def get(self, name, default=None):
+        return self[name] if name in self._index else default
+
+    def slot(self, name):
+        """Posizione del campo in raw."""
+        return self._index[name]
+
+    def divisor(self, name):
+        return self._divisors[self._index[name]]
+
+    def set(self, name, value):
+        """Imposta un valore grezzo (es. la batteria calcolata dall'adattatore)."""
+        self.raw[self._index[name]] = value
+
+    def keys(self):
+        return self.names
+
+    def items(self):
+        return [(name, self[name]) for name in self.names]
+
+    def snapshot(self):
+        """Restituisce una copia dei valori correnti come dict."""
+        return dict(self.items())
+
+    def __repr__(self):
+        return repr(self.snapshot())
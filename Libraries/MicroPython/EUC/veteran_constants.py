@@ -0,0 +1,66 @@
+# micropython/euc/veteran_constants.py
+# Tabelle Veteran, caricate solo con l'adattatore (vedi BLEManager.select_adapter)
+
+CHAR_UUID = "0000FFF1-0000-1000-8000-00805F9B34FB"
+
+# Campi dei dati live (vedi layout.py): pacchetto DC 5A 5C <lunghezza>, verificato sulla cattura Sherman Max
+LIVE_DATA_FIELDS = (
+    ("voltage", 4, 2, False, 100),
+    ("speed", 6, 2, True, 10),
+    ("trip", 8, 4, False, 1000, True),
+    ("distance", 12, 4, False, 1000, True),
+    ("current", 16, 2, True, 10),  # Corrente di fase
+    ("temperature", 18, 2, True, 100),
+    ("auto_off", 20, 2, False, 1),  # Secondi
+    ("charge_mode", 22, 2, False, 1),
+    ("speed_alert", 24, 2, False, 10),
+    ("tiltback_speed", 26, 2, False, 10),
+    ("version", 28, 2, False, 1),
+    ("pedals_mode", 30, 2, False, 1),
+    ("pitch", 32, 2, True, 100),
+    ("pwm", 34, 2, False, 100)
+)
+
+# Informazioni sulle tensioni Veteran
+VOLTAGE_CONFIGS = {
+    100.8: {
+        "cells": 24,
+        "max_voltage": 100.8,
+        "min_voltage": 75.6,  # 3.15V/cella
+        "low_battery_alarm": 78.0,  # 3.25V/cella (Sherman Max)
+        "low_battery_tiltback": 75.6,  # 3.15V/cella (Sherman Max)
+        "supports_low_battery_mode": False  # Non supportato su Sherman Max
+    },
+    126.0: {
+        "cells": 30,
+        "max_voltage": 126.0,
+        "min_voltage": 94.5,  # 3.15V/cella
+        "low_battery_alarm": 97.5,  # 3.25V/cella (Patton)
+        "low_battery_tiltback": 94.5,  # 3.15V/cella (Patton)
+        "supports_low_battery_mode": True  # Supportato su Patton (solo display)
+    },
+    151.2: {
+        "cells": 36,
+        "max_voltage": 151.2,
+        "min_voltage": 113.4,  # 3.15V/cella
+        "low_battery_alarm": 117.0,  # 3.25V/cella (Lynx/Sherman L)
+        "low_battery_tiltback": 113.4,  # 3.15V/cella (Lynx/Sherman L)
+        "supports_low_battery_mode": True  # Supportato su Lynx/Sherman L (solo display)
+    }
+}
+
+# Codici comandi Veteran
+COMMANDS = {
+    "pedals_mode": 0xF1,
+    "lights": 0xE7,
+    "calibration": 0xF7,
+    "speed_alert": 0xF5,
+    "pedal_angle": 0xF6,
+    "horn": 0x88,
+    "serial_data": 0x1B,
+    "ride_mode": 0xF3,
+    "status": 0x1A
+}
+
+# Velocità consentite per gli allarmi Veteran (km/h, valori discreti da verificare); 280 = nessun allarme
+SPEED_LIMITS = (25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 280)
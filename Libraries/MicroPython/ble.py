@@ -1,15 +1,92 @@
 # /lib/ble.py
 import ubluetooth
+import json
+import machine
+import micropython
 import time
 import ure
+from array import array
 from constants import EUC_NAME_FILTERS, EUC_BRANDS, GOTWAY_SERVICE_UUID, INMOTION_SERVICE_UUID
-from errors import BLEScanError, BLEConnectionError, BLECommunicationError
+from errors import BLEScanError, BLEConnectionError, BLECommunicationError, EUCParseError
 
 # Costanti BLE
 _IRQ_SCAN_RESULT = 5
+_IRQ_SCAN_DONE = 6
+_IRQ_PERIPHERAL_CONNECT = 7
+_IRQ_PERIPHERAL_DISCONNECT = 8
+_IRQ_GATTC_SERVICE_RESULT = 9
+_IRQ_GATTC_SERVICE_DONE = 10
+_IRQ_GATTC_CHARACTERISTIC_RESULT = 11
+_IRQ_GATTC_CHARACTERISTIC_DONE = 12
+_IRQ_GATTC_DESCRIPTOR_RESULT = 13
+_IRQ_GATTC_DESCRIPTOR_DONE = 14
+_IRQ_GATTC_WRITE_DONE = 17
+_IRQ_GATTC_NOTIFY = 18
+_IRQ_CONNECTION_UPDATE = 27
+_CCCD_UUID = ubluetooth.UUID(0x2902)
+_FLAG_WRITE_NO_RESPONSE = 0x04
+_HANDLE_CACHE_FILE = "euc_handles.json"  # Handle GATT già risolti, per MAC e adattatore
+_HANDLE_CACHE_MAX = 8
+_RECONNECT_MIN_MS = 100  # Attesa iniziale tra due tentativi di riconnessione
+_RECONNECT_MAX_MS = 2000  # Limite della crescita esponenziale dell'attesa
+_ADV_SLOTS = 32  # Risultati di scansione accodabili dall'IRQ in attesa di elaborazione
+_ADV_MAX_LEN = 31  # Lunghezza massima di un payload di advertising legacy
+_CMD_SLOTS = 16  # Comandi accodabili in attesa di invio
+_CMD_MAX_LEN = 40  # Lunghezza massima di un comando (InMotion con escape: 38 byte)
+_CMD_TIMEOUT_MS = 1000  # Attesa massima della conferma di una scrittura con risposta
+_CONN_INTERVAL_MS = 50  # Intervallo di connessione presunto finché lo stack non ne comunica uno
+_ENOMEM = 12  # Buffer dello stack pieni: la scrittura va ritentata
 V10F_MAC = "f8:33:31:dd:5c:32"
+
+# Stati della connessione
+STATE_IDLE = 0
+STATE_CONNECTING = 1
+STATE_DISCOVER_SERVICES = 2
+STATE_DISCOVER_CHARACTERISTICS = 3
+STATE_DISCOVER_DESCRIPTORS = 4
+STATE_SUBSCRIBING = 5
+STATE_READY = 6
+STATE_FAILED = 7
+
+# Nome della fase misurata in connect_timings quando si esce da ciascuno stato
+_PHASE_NAMES = {
+    STATE_CONNECTING: "connect",
+    STATE_DISCOVER_SERVICES: "services",
+    STATE_DISCOVER_CHARACTERISTICS: "characteristics",
+    STATE_DISCOVER_DESCRIPTORS: "descriptors",
+    STATE_SUBSCRIBING: "subscribe"
+}
 # ALTERNATIVE_INMOTION_UUID = "0000FFF0-0000-1000-8000-00805F9B34FB"
 
+def _build_brand_matchers():
+    """Compila una sola volta i filtri dei nomi, ordinati per priorità: (marca, prefissi, regex)."""
+    matchers = []
+    for brand, filter_info in sorted(EUC_NAME_FILTERS.items(), key=lambda x: x[1].get('priority', 99)):
+        pattern = filter_info.get('name')
+        if not pattern or brand == 'Gotway':
+            continue
+        matchers.append((brand, filter_info.get('prefix', ()), ure.compile(pattern)))
+    return tuple(matchers)
+
+_BRAND_MATCHERS = _build_brand_matchers()
+
+def _classify_name(name):
+    """Identifica la marca dal nome pubblicizzato. Restituisce (euc_type o None, possible_brands)."""
+    possible_brands = []
+    for brand, prefixes, regex in _BRAND_MATCHERS:
+        if prefixes:
+            # Tutti i filtri sono ancorati all'inizio: senza prefisso la regex non può corrispondere
+            for prefix in prefixes:
+                if name.startswith(prefix):
+                    break
+            else:
+                continue
+        if regex.match(name):
+            return brand, possible_brands
+        if regex.search(name):
+            possible_brands.append(brand)
+    return None, possible_brands
+
 class BLEManager:
     def __init__(self):
         try:
@@ -26,123 +103,406 @@ class BLEManager:
         self._data_buffer = bytearray()
         self._connection_timeout = 5
         self.adapter = None
+        self.state = STATE_IDLE
+        self.connect_timings = {}
+        self._connect_error = None
+        self._connect_start = 0
+        self._phase_start = 0
+        self._conn_handle = None
+        self._notify_uuid = None
+        self._write_service_uuid = None
+        self._service_ranges = []
+        self._current_range_end = None
+        self._notify_handle = None
+        self._notify_end = None
+        self._write_handle = None
+        self._write_mode = 0
+        self._cccd_handle = None
+        self._cache_key = None
+        self._handle_cache = None  # Caricata dal flash al primo utilizzo
+        self._handles_dirty = False
+        self.handles_from_cache = False
+        self.auto_reconnect = False
+        self.reconnect_attempts = 5
+        self._last_addr = None  # (addr_type, addr, mac) dell'ultima connessione riuscita
+        self._link_lost_at = None
+        self.last_outage_ms = None
+        self.outages = 0
         self._seen_macs = {}
+        self._new_devices = []
+        self._scan_done = True
+        self._classify_us = 0
+        self._classify_count = 0
+        # Slot preallocati in cui l'IRQ copia i risultati di scansione grezzi
+        self._adv_addr_types = bytearray(_ADV_SLOTS)
+        self._adv_addrs = bytearray(_ADV_SLOTS * 6)
+        self._adv_addrs_mv = memoryview(self._adv_addrs)
+        self._adv_rssi = array('b', bytes(_ADV_SLOTS))
+        self._adv_lens = bytearray(_ADV_SLOTS)
+        self._adv_data = bytearray(_ADV_SLOTS * _ADV_MAX_LEN)
+        self._adv_data_mv = memoryview(self._adv_data)
+        self._adv_head = 0
+        self._adv_tail = 0
+        self._adv_scheduled = False
+        self.adv_dropped = 0
+        # Coda comandi: write() copia i dati in slot preallocati, _pump_commands() li invia
+        # a ritmo dell'intervallo di connessione
+        self.command_window = 4  # Scritture senza risposta per intervallo di connessione
+        self.conn_interval_ms = _CONN_INTERVAL_MS
+        self.command_timings = {}  # {comando: (attesa in coda ms, invio ms)} dell'ultimo invio
+        self.commands_sent = 0
+        self.commands_coalesced = 0
+        self.commands_failed = 0
+        self._cmd_data = bytearray(_CMD_SLOTS * _CMD_MAX_LEN)
+        self._cmd_mv = memoryview(self._cmd_data)
+        self._cmd_lens = bytearray(_CMD_SLOTS)
+        self._cmd_names = [None] * _CMD_SLOTS
+        self._cmd_coalesce = bytearray(_CMD_SLOTS)
+        self._cmd_queued_at = array('i', bytes(4 * _CMD_SLOTS))
+        self._cmd_head = 0
+        self._cmd_count = 0
+        self._cmd_window_start = 0
+        self._cmd_window_sent = 0
+        self._cmd_sent_at = None  # Scrittura con risposta in attesa di _IRQ_GATTC_WRITE_DONE
+        self._cmd_done_at = None
+        self._cmd_inflight_name = None
+        self._cmd_inflight_queue_ms = 0
+        self._process_adv_cb = self._process_adv  # Riferimento creato una sola volta, non nell'IRQ
+        self.ble.irq(self._irq_handler)
+
+    def scan(self, duration_ms=10000, until=None):
+        """Scansiona per al massimo duration_ms e restituisce i dispositivi trovati.
 
-    def scan(self, duration_ms=10000):
+        Se until è indicato (funzione device -> bool, vedi match_device), la scansione
+        termina appena un dispositivo classificato la soddisfa.
+        """
+        for device in self.scan_iter(duration_ms):
+            if until and until(device):
+                break
+        return self.devices
+
+    def scan_iter(self, duration_ms=10000):
+        """Generatore che restituisce i dispositivi man mano che vengono classificati.
+
+        Interrompendo l'iterazione (break) la scansione viene fermata subito.
+        """
+        deadline = self._start_scan(duration_ms)
+        try:
+            while not self._scan_done and time.ticks_diff(deadline, time.ticks_ms()) > 0:
+                while self._new_devices:
+                    yield self._new_devices.pop(0)
+                # Attende il prossimo risultato di scansione senza consumare CPU
+                machine.idle()
+        finally:
+            self._stop_scan()
+        while self._new_devices:
+            yield self._new_devices.pop(0)
+
+    def _start_scan(self, duration_ms):
+        """Avvia la scansione e restituisce la scadenza (ticks_ms) entro cui attenderne la fine."""
         self.devices = []
         self._seen_macs = {}
+        self._new_devices = []
+        self._scan_done = False
         try:
             self.ble.gap_scan(duration_ms, 30000, 30000, True)
-            self.ble.irq(self._irq_handler)
-            time.sleep_ms(duration_ms + 100)
+        except Exception as e:
+            raise BLEScanError(f"Errore durante la scansione BLE: {e}")
+        return time.ticks_add(time.ticks_ms(), duration_ms + 100)
+
+    def find_device(self, mac=None, euc_type=None, min_rssi=None, duration_ms=10000):
+        """Scansiona finché non trova un dispositivo corrispondente ai criteri. Restituisce il dispositivo o None."""
+        until = self.match_device(mac, euc_type, min_rssi)
+        for device in self.scan_iter(duration_ms):
+            if until(device):
+                return device
+        return None
+
+    @staticmethod
+    def match_device(mac=None, euc_type=None, min_rssi=None):
+        """Crea un predicato per scan(until=...): MAC noto, tipo EUC e/o soglia RSSI."""
+        if mac:
+            mac = mac.lower()
+
+        def predicate(device):
+            if mac and device['mac'] != mac:
+                return False
+            if euc_type and device['euc_type'] != euc_type:
+                return False
+            if min_rssi is not None and device['rssi'] < min_rssi:
+                return False
+            return True
+        return predicate
+
+    def _stop_scan(self):
+        try:
             self.ble.gap_scan(None)
+            self._process_adv(None)  # Elabora i risultati rimasti in coda
         except Exception as e:
             raise BLEScanError(f"Errore durante la scansione BLE: {e}")
-        return self.devices
+        self._scan_done = True
 
     def _irq_handler(self, event, data):
         if event == _IRQ_SCAN_RESULT:
+            # Nell'IRQ si copiano solo i dati grezzi in uno slot preallocato;
+            # parsing e classificazione avvengono in _process_adv tramite micropython.schedule
             addr_type, addr, adv_type, rssi, adv_data = data
-            mac = ':'.join(['%02x' % b for b in addr]).lower()
-            name = ''
-            uuids = []
-            
-            # Estrai nome e UUID
-            i = 0
-            while i < len(adv_data):
-                if i + 1 >= len(adv_data):
-                    break
-                length = adv_data[i]
-                if length == 0 or i + length >= len(adv_data):
-                    break
-                ad_type = adv_data[i + 1]
-                
-                if ad_type in (0x08, 0x09):
-                    try:
-                        name_bytes = bytes(adv_data[i + 2:i + length + 1])
-                        name = name_bytes.decode('utf-8', 'ignore')
-                    except Exception:
-                        pass  # Ignora errori di decodifica silenziosamente
-                
-                elif ad_type in (0x02, 0x03, 0x06, 0x07):
-                    try:
-                        uuid = self._parse_uuid(adv_data[i + 2:i + length + 1], ad_type)
-                        if uuid:
-                            uuids.append(uuid)
-                    except Exception:
-                        pass  # Ignora errori di parsing UUID silenziosamente
-                
-                i += length + 1
-            
-            # Scarta dispositivi senza nome e senza UUID Gotway
-            gotway_uuids = [GOTWAY_SERVICE_UUID]
-            if not name and not any(uuid in gotway_uuids for uuid in uuids):
+            slot = self._adv_tail
+            next_slot = (slot + 1) % _ADV_SLOTS
+            if next_slot == self._adv_head:
+                self.adv_dropped += 1
                 return
-            
-            # Deduplicazione
-            update_device = False
-            existing_euc_type = None
-            if mac in self._seen_macs:
-                existing_device = self._seen_macs[mac]
-                existing_euc_type = existing_device.get('euc_type')
-                if name and not existing_device['name']:
-                    self._seen_macs[mac] = {'name': name, 'rssi': rssi, 'adv_data': adv_data, 'uuids': uuids, 'euc_type': existing_euc_type}
-                    update_device = True
-                elif rssi > existing_device['rssi'] and bool(name) == bool(existing_device['name']):
-                    self._seen_macs[mac] = {'name': name, 'rssi': rssi, 'adv_data': adv_data, 'uuids': uuids, 'euc_type': existing_euc_type}
-                    update_device = False
+            n = len(adv_data)
+            offset = slot * _ADV_MAX_LEN
+            if n <= _ADV_MAX_LEN:
+                self._adv_data_mv[offset:offset + n] = adv_data
             else:
-                self._seen_macs[mac] = {'name': name, 'rssi': rssi, 'adv_data': adv_data, 'uuids': uuids, 'euc_type': None}
-                update_device = True
-            
-            if name:
-                print(f"Found device: Name={name}, MAC={mac}, RSSI={rssi}")
-            
-            # Identifica il tipo EUC
-            euc_type = existing_euc_type
-            possible_brands = []
-            matched_by_regex = False
-            if name and not euc_type:
-                for brand, filter_info in sorted(EUC_NAME_FILTERS.items(), key=lambda x: x[1].get('priority', 99)):
-                    pattern = filter_info.get('name')
-                    if not pattern or brand == 'Gotway':
-                        continue
-                    try:
-                        match = ure.match(pattern, name)
-                        if match:
-                            euc_type = brand
-                            matched_by_regex = True
-                            break
-                        if ure.search(pattern, name):
-                            possible_brands.append(brand)
-                    except Exception:
-                        pass  # Ignora errori regex silenziosamente
-            
-            # Verifica UUID per Gotway solo se non identificato tramite regex
-            if not matched_by_regex:
-                if any(uuid in gotway_uuids for uuid in uuids):
-                    euc_type = 'Gotway'
-                elif not euc_type:
-                    euc_type = 'PossibleBegode'
+                # Payload esteso troncato copiando per indice: una slice allocherebbe nell'IRQ
+                n = _ADV_MAX_LEN
+                buf = self._adv_data
+                for i in range(n):
+                    buf[offset + i] = adv_data[i]
+            self._adv_addrs_mv[slot * 6:slot * 6 + 6] = addr
+            self._adv_addr_types[slot] = addr_type
+            self._adv_rssi[slot] = rssi
+            self._adv_lens[slot] = n
+            self._adv_tail = next_slot
+            if not self._adv_scheduled:
+                self._adv_scheduled = True
+                try:
+                    micropython.schedule(self._process_adv_cb, None)
+                except RuntimeError:
+                    self._adv_scheduled = False  # Coda di schedule piena: si riprova al prossimo risultato
+
+        elif event == _IRQ_SCAN_DONE:
+            self._scan_done = True
+            self._signal()
+
+        elif event == _IRQ_PERIPHERAL_CONNECT:
+            conn_handle, addr_type, addr = data
+            if self.state == STATE_CONNECTING:
+                self._conn_handle = conn_handle
+                self.connected = True
+                if self.handles_from_cache:
+                    self._subscribe()  # Handle già noti: si salta la scoperta
+                else:
+                    self._discover()
+
+        elif event == _IRQ_PERIPHERAL_DISCONNECT:
+            conn_handle, addr_type, addr = data
+            if conn_handle == self._conn_handle:
+                self.connected = False
+                self._conn_handle = None
+                if self.state == STATE_READY:
+                    self._link_lost_at = time.ticks_ms()
+                if self.state in (STATE_READY, STATE_IDLE):
+                    self._set_state(STATE_IDLE)
+                else:
+                    self._set_state(STATE_FAILED, "Disconnesso durante la connessione")
+
+        elif event == _IRQ_GATTC_SERVICE_RESULT:
+            conn_handle, start_handle, end_handle, uuid = data
+            if conn_handle == self._conn_handle and (uuid == self.service_uuid or uuid == self._write_service_uuid):
+                self._service_ranges.append((start_handle, end_handle))
+
+        elif event == _IRQ_GATTC_SERVICE_DONE:
+            if self.state == STATE_DISCOVER_SERVICES:
+                if not self._service_ranges:
+                    self._fail_connection("Servizio EUC non trovato")
+                else:
+                    self._set_state(STATE_DISCOVER_CHARACTERISTICS)
+                    self._discover_next_service()
+
+        elif event == _IRQ_GATTC_CHARACTERISTIC_RESULT:
+            conn_handle, end_handle, value_handle, properties, uuid = data
+            if conn_handle == self._conn_handle:
+                if uuid == self._notify_uuid and self._notify_handle is None:
+                    self._notify_handle = value_handle
+                    self._notify_end = self._current_range_end
+                if uuid == self.char_uuid and self._write_handle is None:
+                    self._write_handle = value_handle
+                    self._write_mode = 0 if properties & _FLAG_WRITE_NO_RESPONSE else 1
+
+        elif event == _IRQ_GATTC_CHARACTERISTIC_DONE:
+            if self.state == STATE_DISCOVER_CHARACTERISTICS:
+                if self._service_ranges:
+                    self._discover_next_service()
+                elif self._notify_handle is None or self._write_handle is None:
+                    self._fail_connection("Caratteristiche EUC non trovate")
+                else:
+                    self._set_state(STATE_DISCOVER_DESCRIPTORS)
+                    self.ble.gattc_discover_descriptors(self._conn_handle, self._notify_handle + 1, self._notify_end)
+
+        elif event == _IRQ_GATTC_DESCRIPTOR_RESULT:
+            conn_handle, dsc_handle, uuid = data
+            if conn_handle == self._conn_handle and uuid == _CCCD_UUID and self._cccd_handle is None:
+                self._cccd_handle = dsc_handle
+
+        elif event == _IRQ_GATTC_DESCRIPTOR_DONE:
+            if self.state == STATE_DISCOVER_DESCRIPTORS:
+                if self._cccd_handle is None:
+                    self._cccd_handle = self._notify_handle + 1  # Posizione convenzionale del CCCD
+                self._subscribe()
+
+        elif event == _IRQ_GATTC_WRITE_DONE:
+            conn_handle, value_handle, status = data
+            if self.state == STATE_SUBSCRIBING and value_handle == self._cccd_handle:
+                if status == 0:
+                    if not self.handles_from_cache:
+                        self._handles_dirty = True
+                    self._set_state(STATE_READY)
+                elif self.handles_from_cache:
+                    # Handle in cache non più validi (es. firmware aggiornato): scoperta completa
+                    self.handles_from_cache = False
+                    self._handles_dirty = True
+                    self._notify_handle = None
+                    self._write_handle = None
+                    self._cccd_handle = None
+                    self._discover()
+                else:
+                    self._fail_connection(f"Abilitazione notifiche fallita (stato {status})")
+            elif value_handle == self._write_handle and self._cmd_sent_at is not None:
+                self._cmd_done_at = time.ticks_ms()
+                if status:
+                    self.commands_failed += 1
+                self._signal()
+
+        elif event == _IRQ_CONNECTION_UPDATE:
+            conn_handle, conn_interval, conn_latency, supervision_timeout, status = data
+            if conn_handle == self._conn_handle and status == 0:
+                self.conn_interval_ms = max(conn_interval * 5 // 4, 8)  # Unità da 1.25 ms
+
+        elif event == _IRQ_GATTC_NOTIFY:
+            # I dati notificati vanno direttamente nel buffer dell'adattatore:
+            # il parsing avviene fuori dall'IRQ, in read_frame()/frames()
+            conn_handle, value_handle, notify_data = data
+            if self.adapter and value_handle == self._notify_handle:
+                self.adapter.feed(notify_data)
+                self._signal()
+
+    def _signal(self):
+        """Segnala un evento (notifica, dispositivo trovato, cambio di stato) a chi è in attesa.
+
+        Chiamato anche dall'IRQ: la versione sincrona attende con machine.idle() e non
+        ne ha bisogno, AsyncBLEManager la ridefinisce per risvegliare i task asyncio.
+        """
+
+    def _process_adv(self, _):
+        """Elabora in blocco i risultati di scansione accodati dall'IRQ."""
+        self._adv_scheduled = False
+        while self._adv_head != self._adv_tail:
+            slot = self._adv_head
+            offset = slot * _ADV_MAX_LEN
+            addr = self._adv_addrs_mv[slot * 6:slot * 6 + 6]
+            mac = ':'.join(['%02x' % b for b in addr]).lower()
+            adv_data = bytes(self._adv_data_mv[offset:offset + self._adv_lens[slot]])
+            rssi = self._adv_rssi[slot]
+            addr_type = self._adv_addr_types[slot]
+            self._adv_head = (slot + 1) % _ADV_SLOTS
+            self._handle_adv(addr_type, mac, rssi, adv_data)
+
+    def _handle_adv(self, addr_type, mac, rssi, adv_data):
+        """Parsa un advertising, lo deduplica e classifica il tipo EUC (fuori dal contesto IRQ)."""
+        name = ''
+        uuids = []
+        
+        # Estrai nome e UUID
+        i = 0
+        while i < len(adv_data):
+            if i + 1 >= len(adv_data):
+                break
+            length = adv_data[i]
+            if length == 0 or i + length >= len(adv_data):
+                break
+            ad_type = adv_data[i + 1]
             
-            # Aggiorna euc_type in _seen_macs
-            self._seen_macs[mac]['euc_type'] = euc_type
+            if ad_type in (0x08, 0x09):
+                try:
+                    name_bytes = bytes(adv_data[i + 2:i + length + 1])
+                    name = name_bytes.decode('utf-8', 'ignore')
+                except Exception:
+                    pass  # Ignora errori di decodifica silenziosamente
             
-            # Aggiungi o aggiorna dispositivo
-            device = {
-                'name': name,
-                'euc_type': euc_type,
-                'adv_data': adv_data,
-                'uuids': uuids,
-                'mac': mac,
-                'rssi': rssi,
-                'possible_brands': possible_brands
-            }
+            elif ad_type in (0x02, 0x03, 0x06, 0x07):
+                try:
+                    uuid = self._parse_uuid(adv_data[i + 2:i + length + 1], ad_type)
+                    if uuid:
+                        uuids.append(uuid)
+                except Exception:
+                    pass  # Ignora errori di parsing UUID silenziosamente
             
-            if update_device:
-                self.devices = [d for d in self.devices if d['mac'] != mac]
-                self.devices.append(device)
+            i += length + 1
+        
+        # Scarta dispositivi senza nome e senza UUID Gotway
+        gotway_uuids = [GOTWAY_SERVICE_UUID]
+        if not name and not any(uuid in gotway_uuids for uuid in uuids):
+            return
+        
+        # Deduplicazione
+        update_device = False
+        existing_euc_type = None
+        if mac in self._seen_macs:
+            existing_device = self._seen_macs[mac]
+            existing_euc_type = existing_device.get('euc_type')
+            if name and not existing_device['name']:
+                self._seen_macs[mac] = {'name': name, 'rssi': rssi, 'adv_data': adv_data, 'uuids': uuids, 'euc_type': existing_euc_type}
+                update_device = True
+            elif rssi > existing_device['rssi'] and bool(name) == bool(existing_device['name']):
+                self._seen_macs[mac] = {'name': name, 'rssi': rssi, 'adv_data': adv_data, 'uuids': uuids, 'euc_type': existing_euc_type}
+                update_device = False
+        else:
+            self._seen_macs[mac] = {'name': name, 'rssi': rssi, 'adv_data': adv_data, 'uuids': uuids, 'euc_type': None}
+            update_device = True
+        
+        if name:
+            print(f"Found device: Name={name}, MAC={mac}, RSSI={rssi}")
+        
+        # Identifica il tipo EUC
+        euc_type = existing_euc_type
+        possible_brands = []
+        matched_by_regex = False
+        if name and not euc_type:
+            start_us = time.ticks_us()
+            brand, possible_brands = _classify_name(name)
+            self._classify_us += time.ticks_diff(time.ticks_us(), start_us)
+            self._classify_count += 1
+            if brand:
+                euc_type = brand
+                matched_by_regex = True
+        
+        # Verifica UUID per Gotway solo se non identificato tramite regex
+        if not matched_by_regex:
+            if any(uuid in gotway_uuids for uuid in uuids):
+                euc_type = 'Gotway'
+            elif not euc_type:
+                euc_type = 'PossibleBegode'
+        
+        # Aggiorna euc_type in _seen_macs
+        self._seen_macs[mac]['euc_type'] = euc_type
+        
+        # Aggiungi o aggiorna dispositivo
+        device = {
+            'name': name,
+            'euc_type': euc_type,
+            'adv_data': adv_data,
+            'uuids': uuids,
+            'mac': mac,
+            'addr_type': addr_type,
+            'rssi': rssi,
+            'possible_brands': possible_brands
+        }
+        
+        if update_device:
+            self.devices = [d for d in self.devices if d['mac'] != mac]
+            self.devices.append(device)
+            self._new_devices.append(device)
+            self._signal()
 
+    def classify_stats(self):
+        """Restituisce (numero di nomi classificati, tempo medio di classificazione in µs)."""
+        if not self._classify_count:
+            return 0, 0
+        return self._classify_count, self._classify_us // self._classify_count
 
     def _parse_uuid(self, data, ad_type):
         try:
@@ -195,75 +555,417 @@ class BLEManager:
             module = __import__(adapter_info["module"], fromlist=[adapter_info["class"]])
             adapter_class = getattr(module, adapter_info["class"])
             
-            return adapter_class(self.ble, **adapter_info["args"])
+            return adapter_class(self, **adapter_info["args"])
         except Exception as e:
             raise BLEConnectionError(f"Errore selezione adattatore: {e}")
 
+    def _set_state(self, state, error=None):
+        """Cambia stato registrando la durata della fase appena conclusa in connect_timings."""
+        now = time.ticks_ms()
+        phase = _PHASE_NAMES.get(self.state)
+        if phase:
+            self.connect_timings[phase] = time.ticks_diff(now, self._phase_start)
+        self._phase_start = now
+        self.state = state
+        if error:
+            self._connect_error = error
+        if state in (STATE_READY, STATE_FAILED):
+            self.connect_timings["total"] = time.ticks_diff(now, self._connect_start)
+        self._signal()
+
+    def _fail_connection(self, error):
+        self._set_state(STATE_FAILED, error)
+        if self._conn_handle is not None:
+            try:
+                self.ble.gap_disconnect(self._conn_handle)
+            except Exception:
+                pass  # La connessione verrà comunque chiusa dal timeout dello stack
+
+    def _discover(self):
+        self._set_state(STATE_DISCOVER_SERVICES)
+        self.ble.gattc_discover_services(self._conn_handle)
+
+    def _discover_next_service(self):
+        start_handle, end_handle = self._service_ranges.pop(0)
+        self._current_range_end = end_handle
+        self.ble.gattc_discover_characteristics(self._conn_handle, start_handle, end_handle)
+
+    def _subscribe(self):
+        self._set_state(STATE_SUBSCRIBING)
+        self.ble.gattc_write(self._conn_handle, self._cccd_handle, b'\x01\x00', 1)
+
+    def _load_handle_cache(self):
+        if self._handle_cache is None:
+            try:
+                with open(_HANDLE_CACHE_FILE) as f:
+                    self._handle_cache = json.load(f)
+            except (OSError, ValueError):
+                self._handle_cache = {}  # File assente o corrotto: si riparte da zero
+        return self._handle_cache
+
+    def _save_handle_cache(self):
+        try:
+            with open(_HANDLE_CACHE_FILE, "w") as f:
+                json.dump(self._handle_cache, f)
+        except OSError:
+            pass  # Cache non persistita: la prossima connessione rifarà la scoperta
+
+    def _update_handle_cache(self):
+        """Salva (o rimuove, se la connessione è fallita) gli handle della connessione corrente."""
+        if not self._handles_dirty:
+            return
+        self._handles_dirty = False
+        cache = self._load_handle_cache()
+        if self.state == STATE_READY:
+            cache[self._cache_key] = [self._notify_handle, self._write_handle, self._write_mode, self._cccd_handle]
+            while len(cache) > _HANDLE_CACHE_MAX:
+                cache.pop(next(iter(cache)))
+        else:
+            cache.pop(self._cache_key, None)
+        self._save_handle_cache()
+
+    def forget_handles(self, mac=None):
+        """Invalida gli handle in cache per il MAC indicato, o per tutti i dispositivi."""
+        cache = self._load_handle_cache()
+        for key in list(cache):
+            if mac is None or key.startswith(mac.lower() + "|"):
+                del cache[key]
+        self._save_handle_cache()
+
+    def _start_connect(self, addr_type, addr, mac):
+        """Avvia la macchina a stati di connessione; l'esito arriva tramite gli eventi IRQ."""
+        self.service_uuid = ubluetooth.UUID(self.adapter.service_uuid)
+        self.char_uuid = ubluetooth.UUID(self.adapter.write_uuid)
+        self._notify_uuid = ubluetooth.UUID(self.adapter.notify_uuid)
+        # Alcune ruote (es. InMotion V10F) espongono la caratteristica di scrittura in un altro servizio
+        write_service = getattr(self.adapter, "write_service_uuid", None)
+        self._write_service_uuid = ubluetooth.UUID(write_service) if write_service else self.service_uuid
+        self._service_ranges = []
+        self._current_range_end = None
+        self._notify_handle = None
+        self._notify_end = None
+        self._write_handle = None
+        self._cccd_handle = None
+        self._handles_dirty = False
+        self._cmd_sent_at = None  # Una conferma attesa sul collegamento precedente non arriverà più
+        self._cmd_done_at = None
+        self._cache_key = f"{mac.lower()}|{type(self.adapter).__name__}"
+        cached = self._load_handle_cache().get(self._cache_key)
+        self.handles_from_cache = bool(cached)
+        if cached:
+            self._notify_handle, self._write_handle, self._write_mode, self._cccd_handle = cached
+        self._connect_error = None
+        self.connect_timings = {}
+        self._connect_start = time.ticks_ms()
+        self._phase_start = self._connect_start
+        self.state = STATE_CONNECTING
+        self.ble.gap_connect(addr_type, addr)
+
+    def _wait(self, condition, timeout_ms):
+        """Attende (senza polling attivo) che condition() sia vera. Restituisce False allo scadere del timeout."""
+        deadline = time.ticks_add(time.ticks_ms(), timeout_ms)
+        while not condition():
+            if time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+                return False
+            machine.idle()
+        return True
+
+    def _await_ready(self, mac):
+        """Attende l'esito della connessione avviata. Restituisce True se è pronta."""
+        finished = self._wait(lambda: self.state in (STATE_READY, STATE_FAILED), self._connection_timeout * 1000)
+        return self._connect_outcome(mac, finished)
+
+    def _connect_outcome(self, mac, finished):
+        """Chiude il tentativo di connessione (timeout, cache degli handle). Restituisce True se è pronta."""
+        if not finished:
+            self._fail_connection(f"Timeout connessione a {mac}")
+            if self._conn_handle is None:
+                self.ble.gap_connect(None)  # Annulla il tentativo ancora in corso
+        self._update_handle_cache()
+        return self.state == STATE_READY
+
     def connect(self, mac, euc_type, model="V10F"):
+        """Si connette, scopre servizi e caratteristiche e abilita le notifiche.
+
+        Ritorna appena lo stack segnala la connessione pronta o fallita; la durata
+        di ogni fase è disponibile in connect_timings (ms). Se gli handle GATT del
+        dispositivo sono in cache la scoperta viene saltata (handles_from_cache).
+        """
         if self.connected:
             raise BLEConnectionError("Già connesso a un dispositivo.")
         
         try:
-            if euc_type == 'PossibleBegode':
-                for device in self.devices:
-                    if device['mac'] == mac:
-                        uuids = self._parse_adv_uuids(device['adv_data'])
-                        if GOTWAY_SERVICE_UUID not in uuids:
-                            raise BLEConnectionError(f"Dispositivo {mac} non è un Begode valido")
-                        euc_type = 'Gotway'
-                        break
-            
-            self.adapter = self.select_adapter(euc_type, model)
-            self.service_uuid = ubluetooth.UUID(self.adapter.service_uuid)
-            self.char_uuid = ubluetooth.UUID(self.adapter.write_uuid)
-            addr = bytes(int(x, 16) for x in mac.split(":"))
-            self.ble.gap_connect(0, addr)
-            
-            start_time = time.time()
-            while not self.connected and (time.time() - start_time) < self._connection_timeout:
-                time.sleep_ms(100)
-            
-            if not self.connected:
-                raise BLEConnectionError(f"Timeout connessione a {mac}")
-            
-            self.current_device = mac
-            self.ble.gattc_write(self.char_uuid, b'\x01\x00', 1)
+            addr_type, addr = self._begin_connect(mac, euc_type, model)
+            if not self._await_ready(mac):
+                raise BLEConnectionError(self._connect_error)
+            self._connected_to(addr_type, addr, mac)
         except ValueError as e:
             raise BLEConnectionError(f"Formato MAC non valido: {e}")
         except Exception as e:
             raise BLEConnectionError(f"Errore connessione a {mac}: {e}")
 
-    def read(self):
-        if not self.connected:
-            raise BLECommunicationError("Non connesso a nessun dispositivo.")
+    def _begin_connect(self, mac, euc_type, model):
+        """Seleziona l'adattatore e avvia la connessione. Restituisce (addr_type, addr)."""
+        addr_type = 0
+        for device in self.devices:
+            if device['mac'] == mac:
+                addr_type = device.get('addr_type', 0)
+                if euc_type == 'PossibleBegode':
+                    if GOTWAY_SERVICE_UUID not in device['uuids']:
+                        raise BLEConnectionError(f"Dispositivo {mac} non è un Begode valido")
+                    euc_type = 'Gotway'
+                break
         
+        self.adapter = self.select_adapter(euc_type, model)
+        addr = bytes(int(x, 16) for x in mac.split(":"))
+        self._start_connect(addr_type, addr, mac)
+        return addr_type, addr
+
+    def _connected_to(self, addr_type, addr, mac):
+        self.current_device = mac
+        self._last_addr = (addr_type, addr, mac)
+        self._link_lost_at = None
+
+    def reconnect(self, attempts=None):
+        """Ricollega l'ultimo dispositivo senza nuova scansione, riusando l'adattatore e il suo stato.
+
+        Tra un tentativo e l'altro l'attesa raddoppia da _RECONNECT_MIN_MS fino a
+        _RECONNECT_MAX_MS. La durata dell'interruzione viene salvata in last_outage_ms.
+        """
+        if self.connected:
+            return
+        mac = self._reconnect_target()
+        delay = _RECONNECT_MIN_MS
+        for attempt in range(attempts or self.reconnect_attempts):
+            if attempt:
+                time.sleep_ms(delay)
+                delay = min(delay * 2, _RECONNECT_MAX_MS)
+            if self._begin_reconnect() and self._await_ready(mac):
+                self._reconnected()
+                return
+        raise BLEConnectionError(f"Riconnessione a {mac} fallita: {self._connect_error}")
+
+    def _reconnect_target(self):
+        """Verifica che ci sia un dispositivo da ricollegare e ne restituisce il MAC."""
+        if self.adapter is None or self._last_addr is None:
+            raise BLEConnectionError("Nessun dispositivo da ricollegare.")
+        if self._link_lost_at is None:
+            self._link_lost_at = time.ticks_ms()
+        return self._last_addr[2]
+
+    def _begin_reconnect(self):
+        """Avvia un tentativo di riconnessione. Restituisce False se non è partito."""
+        self.adapter.buffer.clear()  # Un pacchetto troncato dalla disconnessione non va ricomposto
         try:
-            data = self.ble.gattc_read(self.char_uuid)
-            if data:
-                self._data_buffer.extend(data)
-                return self.adapter.decode(data)
-            return None
-        except Exception as e:
-            self.disconnect()
-            raise BLECommunicationError(f"Errore lettura dati BLE: {e}")
+            self._start_connect(*self._last_addr)
+            return True
+        except Exception:
+            self._fail_connection(f"Errore riconnessione a {self._last_addr[2]}")
+            return False
+
+    def _reconnected(self):
+        self.last_outage_ms = time.ticks_diff(time.ticks_ms(), self._link_lost_at)
+        self.outages += 1
+        self._link_lost_at = None
+
+    def _needs_reconnect(self):
+        """True se il collegamento è perso e auto_reconnect può ripristinarlo; BLECommunicationError se non connesso."""
+        if self.connected:
+            return False
+        if self.auto_reconnect and self.adapter is not None and self._last_addr is not None:
+            return True
+        raise BLECommunicationError("Non connesso a nessun dispositivo.")
+
+    def _ensure_link(self):
+        """Verifica la connessione; con auto_reconnect ripristina il collegamento perso."""
+        if self._needs_reconnect():
+            self._restore_link()
 
-    def write(self, data):
-        if not self.connected:
-            raise BLECommunicationError("Non connesso a nessun dispositivo.")
+    def _restore_link(self):
+        """Ripristina il collegamento perso. Le sottoclassi che non possono bloccare lo ridefiniscono."""
+        self.reconnect()
+
+    def read(self):
+        """Restituisce il prossimo pacchetto decodificato (equivale a read_frame())."""
+        self._ensure_link()
         
         try:
-            self.ble.gattc_write(self.char_uuid, data)
+            return self.read_frame()
+        except (EUCParseError, BLEConnectionError):
+            raise
         except Exception as e:
+            self._drop_link()
+            raise BLECommunicationError(f"Errore lettura dati BLE: {e}")
+
+    def read_frame(self, timeout_ms=1000):
+        """Restituisce il prossimo pacchetto decodificato ricevuto tramite notifica, o None allo scadere del timeout."""
+        self._ensure_link()
+
+        deadline = time.ticks_add(time.ticks_ms(), timeout_ms)
+        while True:
+            result = self.adapter.poll()
+            if result:
+                return result
+            if time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+                return None
+            self._pump_commands()
+            # Attende la prossima interruzione (notifica BLE o tick di sistema)
+            machine.idle()
+
+    def frames(self):
+        """Generatore che restituisce i pacchetti decodificati man mano che arrivano le notifiche.
+
+        Con auto_reconnect una caduta del collegamento non interrompe il flusso.
+        """
+        while self.connected or (self.auto_reconnect and self.adapter is not None):
+            try:
+                result = self.read_frame()
+            except EUCParseError:
+                continue  # Pacchetto corrotto: si passa al successivo senza interrompere il flusso
+            if result:
+                yield result
+
+    def write(self, data, name=None, coalesce=False, timeout_ms=1000):
+        """Accoda un comando e ne avvia l'invio; ritorna appena i dati sono copiati in coda.
+
+        Con coalesce un comando con lo stesso name ancora in coda viene sostituito (vince
+        l'ultimo). Se la coda è piena attende fino a timeout_ms che si liberi uno slot.
+        """
+        self._ensure_link()
+        if not self._enqueue_command(data, name, coalesce):
+            if not self._wait(self._command_slot_free, timeout_ms):
+                raise BLECommunicationError("Coda comandi piena.")
+            self._enqueue_command(data, name, coalesce)
+        self._pump_commands()
+
+    def _enqueue_command(self, data, name, coalesce):
+        """Copia il comando in coda (o sul comando sostituibile). Restituisce False se la coda è piena."""
+        n = len(data)
+        if n > _CMD_MAX_LEN:
+            raise BLECommunicationError(f"Comando troppo lungo: {n} byte")
+        slot = self._queued_command(name) if coalesce else -1
+        if slot >= 0:
+            self.commands_coalesced += 1
+        else:
+            if self._cmd_count == _CMD_SLOTS:
+                return False
+            slot = (self._cmd_head + self._cmd_count) % _CMD_SLOTS
+            self._cmd_count += 1
+            self._cmd_names[slot] = name or "write"
+            self._cmd_coalesce[slot] = coalesce
+            self._cmd_queued_at[slot] = time.ticks_ms()
+        offset = slot * _CMD_MAX_LEN
+        self._cmd_mv[offset:offset + n] = data
+        self._cmd_lens[slot] = n
+        return True
+
+    def _queued_command(self, name):
+        """Slot del comando sostituibile name ancora in coda, o -1."""
+        for i in range(self._cmd_count):
+            slot = (self._cmd_head + i) % _CMD_SLOTS
+            if self._cmd_coalesce[slot] and self._cmd_names[slot] == name:
+                return slot
+        return -1
+
+    def _command_slot_free(self):
+        self._pump_commands()
+        return self._cmd_count < _CMD_SLOTS
+
+    def _commands_idle(self):
+        self._pump_commands()
+        return not self._cmd_count and self._cmd_sent_at is None
+
+    def _pump_commands(self):
+        """Invia i comandi in coda senza superare la capacità del collegamento.
+
+        Le scritture con risposta partono una alla volta, dopo la conferma della precedente;
+        quelle senza risposta fino a command_window per intervallo di connessione. Se lo
+        stack non ha buffer liberi il comando resta in coda per l'intervallo successivo.
+        """
+        if self._cmd_sent_at is not None:
+            done_at = self._cmd_done_at
+            if done_at is None:
+                if time.ticks_diff(time.ticks_ms(), self._cmd_sent_at) < _CMD_TIMEOUT_MS:
+                    return
+                done_at = time.ticks_ms()  # Conferma persa: si prosegue con la coda
+            self.command_timings[self._cmd_inflight_name] = (self._cmd_inflight_queue_ms,
+                                                             time.ticks_diff(done_at, self._cmd_sent_at))
+            self._cmd_sent_at = None
+            self._cmd_done_at = None
+        while self._cmd_count and self.connected:
+            now = time.ticks_ms()
+            if time.ticks_diff(now, self._cmd_window_start) >= self.conn_interval_ms:
+                self._cmd_window_start = now
+                self._cmd_window_sent = 0
+            if self._cmd_window_sent >= self.command_window:
+                return
+            slot = self._cmd_head
+            offset = slot * _CMD_MAX_LEN
+            try:
+                self.ble.gattc_write(self._conn_handle, self._write_handle,
+                                     self._cmd_mv[offset:offset + self._cmd_lens[slot]], self._write_mode)
+            except OSError as e:
+                if e.args[0] == _ENOMEM:
+                    self._cmd_window_sent = self.command_window
+                    return
+                self._drop_link()
+                raise BLECommunicationError(f"Errore scrittura dati BLE: {e}")
+            except Exception as e:
+                self._drop_link()
+                raise BLECommunicationError(f"Errore scrittura dati BLE: {e}")
+            sent_at = time.ticks_ms()
+            name = self._cmd_names[slot]
+            queue_ms = time.ticks_diff(now, self._cmd_queued_at[slot])
+            self._cmd_names[slot] = None
+            self._cmd_head = (slot + 1) % _CMD_SLOTS
+            self._cmd_count -= 1
+            self._cmd_window_sent += 1
+            self.commands_sent += 1
+            if self._write_mode:
+                # Con risposta: il comando successivo parte dopo _IRQ_GATTC_WRITE_DONE
+                self._cmd_inflight_name = name
+                self._cmd_inflight_queue_ms = queue_ms
+                self._cmd_sent_at = sent_at
+                return
+            self.command_timings[name] = (queue_ms, time.ticks_diff(sent_at, now))
+
+    def pending_commands(self):
+        """Numero di comandi in coda o in attesa di conferma."""
+        return self._cmd_count + (self._cmd_sent_at is not None)
+
+    def flush_commands(self, timeout_ms=1000):
+        """Attende l'invio di tutti i comandi in coda. Restituisce False allo scadere del timeout."""
+        return self._wait(self._commands_idle, timeout_ms)
+
+    def _drop_link(self):
+        """Chiude il collegamento dopo un errore. Con auto_reconnect adattatore e dispositivo restano validi."""
+        if not self.auto_reconnect:
             self.disconnect()
-            raise BLECommunicationError(f"Errore scrittura dati BLE: {e}")
+            return
+        if self.connected:
+            self._link_lost_at = time.ticks_ms()
+            try:
+                self.ble.gap_disconnect(self._conn_handle)
+            except Exception:
+                pass  # Il collegamento è già compromesso: conta solo lo stato locale
+        self.connected = False
+        self._conn_handle = None
+        self.state = STATE_IDLE
 
     def disconnect(self):
         try:
             if self.connected:
-                self.ble.gap_disconnect()
+                self.ble.gap_disconnect(self._conn_handle)
                 self.connected = False
-                self.current_device = None
-                self._data_buffer = bytearray()
-                self.adapter = None
+                self._conn_handle = None
+                self.state = STATE_IDLE
+            self.current_device = None
+            self._data_buffer = bytearray()
+            self.adapter = None
+            self._last_addr = None
+            self._link_lost_at = None
+            self._cmd_count = 0  # I comandi non ancora inviati vengono scartati
+            self._cmd_sent_at = None
+            self._cmd_done_at = None
         except Exception as e:
             raise BLECommunicationError(f"Errore disconnessione: {e}")
\ No newline at end of file
@@ -0,0 +1,224 @@
+# /lib/ble_async.py
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+import time
+from ble import BLEManager, STATE_READY, STATE_FAILED, _RECONNECT_MIN_MS, _RECONNECT_MAX_MS
+from errors import BLEConnectionError, BLECommunicationError, EUCParseError
+
+_WAITERS = 4  # Task che possono attendere eventi BLE insieme (lettura, riconnessione, flush, scansione)
+
+class AsyncBLEManager(BLEManager):
+    """BLEManager per asyncio: scansione, connessione e lettura cedono la CPU agli altri task.
+
+    L'IRQ segnala ogni evento (notifica, dispositivo trovato, cambio di stato) tramite
+    asyncio.ThreadSafeFlag. Un flag ammette un solo task in attesa, quindi ogni task che
+    attende (es. stream(), flush_commands() e la riconnessione avviata da write()) ne occupa
+    uno da un gruppo preallocato di _WAITERS, e l'IRQ li segnala tutti.
+
+    write() resta sincrona perché la chiamano i comandi degli adattatori, ma non blocca:
+    con il collegamento perso accoda il comando e lascia la riconnessione al task che
+    legge (o a un task avviato apposta se nessuno sta leggendo).
+    """
+
+    def __init__(self):
+        # Creati prima di registrare l'IRQ
+        self._flags = tuple(asyncio.ThreadSafeFlag() for _ in range(_WAITERS))
+        self._flag_busy = bytearray(_WAITERS)
+        self._reconnect_task = None
+        self._reading = False  # Un task è dentro read_frame(): è lui a riconnettere
+        super().__init__()
+
+    def _signal(self):
+        # Anche i flag liberi: un evento arrivato prima dell'attesa la fa solo terminare subito
+        flags = self._flags
+        for i in range(_WAITERS):
+            flags[i].set()
+
+    async def _wait_event(self, timeout_ms):
+        """Attende il prossimo evento BLE o lo scadere di timeout_ms, su un flag riservato al task."""
+        busy = self._flag_busy
+        slot = 0
+        while slot < _WAITERS and busy[slot]:
+            slot += 1
+        if slot == _WAITERS:
+            raise BLECommunicationError(f"Troppi task in attesa di eventi BLE (massimo {_WAITERS}).")
+        busy[slot] = 1
+        try:
+            await asyncio.wait_for_ms(self._flags[slot].wait(), timeout_ms)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            busy[slot] = 0
+
+    async def scan(self, duration_ms=10000, until=None):
+        """Scansiona per al massimo duration_ms e restituisce i dispositivi trovati (vedi BLEManager.scan)."""
+        deadline = self._start_scan(duration_ms)
+        try:
+            while not self._scan_done:
+                while self._new_devices:
+                    if until and until(self._new_devices.pop(0)):
+                        return self.devices
+                remaining = time.ticks_diff(deadline, time.ticks_ms())
+                if remaining <= 0:
+                    break
+                await self._wait_event(remaining)
+        finally:
+            self._stop_scan()
+        self._new_devices = []
+        return self.devices
+
+    async def find_device(self, mac=None, euc_type=None, min_rssi=None, duration_ms=10000):
+        """Scansiona finché non trova un dispositivo corrispondente ai criteri. Restituisce il dispositivo o None."""
+        until = self.match_device(mac, euc_type, min_rssi)
+        for device in await self.scan(duration_ms, until):
+            if until(device):
+                return device
+        return None
+
+    async def _await_ready(self, mac):
+        deadline = time.ticks_add(time.ticks_ms(), self._connection_timeout * 1000)
+        finished = True
+        while self.state not in (STATE_READY, STATE_FAILED):
+            remaining = time.ticks_diff(deadline, time.ticks_ms())
+            if remaining <= 0:
+                finished = False
+                break
+            await self._wait_event(remaining)
+        return self._connect_outcome(mac, finished)
+
+    async def connect(self, mac, euc_type, model="V10F"):
+        """Si connette e abilita le notifiche senza bloccare gli altri task (vedi BLEManager.connect)."""
+        if self.connected:
+            raise BLEConnectionError("Già connesso a un dispositivo.")
+
+        try:
+            addr_type, addr = self._begin_connect(mac, euc_type, model)
+            if not await self._await_ready(mac):
+                raise BLEConnectionError(self._connect_error)
+            self._connected_to(addr_type, addr, mac)
+        except ValueError as e:
+            raise BLEConnectionError(f"Formato MAC non valido: {e}")
+        except Exception as e:
+            raise BLEConnectionError(f"Errore connessione a {mac}: {e}")
+
+    async def reconnect(self, attempts=None):
+        """Ricollega l'ultimo dispositivo riusando l'adattatore (vedi BLEManager.reconnect)."""
+        if self.connected:
+            return
+        mac = self._reconnect_target()
+        delay = _RECONNECT_MIN_MS
+        for attempt in range(attempts or self.reconnect_attempts):
+            if attempt:
+                await asyncio.sleep_ms(delay)
+                delay = min(delay * 2, _RECONNECT_MAX_MS)
+            if self._begin_reconnect() and await self._await_ready(mac):
+                self._reconnected()
+                return
+        raise BLEConnectionError(f"Riconnessione a {mac} fallita: {self._connect_error}")
+
+    def _reconnecting(self):
+        return self._reconnect_task is not None and not self._reconnect_task.done()
+
+    def _restore_link(self):
+        """Chiamata dai percorsi sincroni (write): non attende, avvia al più la riconnessione in un task."""
+        if self._reading or self._reconnecting():
+            return  # Ricollega il task che legge, o una riconnessione è già in corso
+        self._reconnect_task = asyncio.create_task(self._reconnect_quietly())
+
+    async def _reconnect_quietly(self):
+        try:
+            await self.reconnect()
+        except BLEConnectionError:
+            pass  # L'errore resta in _connect_error; il prossimo read_frame() ritenta
+
+    async def _await_link(self):
+        """Come _ensure_link, ma attende la riconnessione (quella già in corso, se c'è)."""
+        if not self._needs_reconnect():
+            return
+        if self._reconnecting():
+            await self._reconnect_task
+        if not self.connected:
+            await self.reconnect()
+
+    async def read(self):
+        """Restituisce il prossimo pacchetto decodificato (equivale a read_frame())."""
+        try:
+            return await self.read_frame()
+        except (EUCParseError, BLEConnectionError, BLECommunicationError):
+            raise
+        except Exception as e:
+            self._drop_link()
+            raise BLECommunicationError(f"Errore lettura dati BLE: {e}")
+
+    async def read_frame(self, timeout_ms=1000):
+        """Restituisce il prossimo pacchetto decodificato, o None allo scadere del timeout."""
+        self._reading = True
+        try:
+            await self._await_link()
+            deadline = time.ticks_add(time.ticks_ms(), timeout_ms)
+            while True:
+                result = self.adapter.poll()
+                if result:
+                    return result
+                remaining = time.ticks_diff(deadline, time.ticks_ms())
+                if remaining <= 0 or not self.connected:
+                    return None
+                self._pump_commands()
+                if self._cmd_count:
+                    # Comandi in attesa del prossimo intervallo di connessione
+                    remaining = min(remaining, self.conn_interval_ms)
+                await self._wait_event(remaining)
+        finally:
+            self._reading = False
+
+    def write(self, data, name=None, coalesce=False, timeout_ms=0):
+        """Accoda un comando senza bloccare il loop (vedi BLEManager.write).
+
+        Se la coda è piena lancia subito BLECommunicationError: timeout_ms è ignorato.
+        """
+        self._ensure_link()
+        if not self._enqueue_command(data, name, coalesce):
+            if not (self._command_slot_free() and self._enqueue_command(data, name, coalesce)):
+                raise BLECommunicationError("Coda comandi piena.")
+        self._pump_commands()
+
+    def frames(self):
+        """Come stream(): async for frame in ble.frames()."""
+        return self.stream()
+
+    async def flush_commands(self, timeout_ms=1000):
+        """Attende l'invio di tutti i comandi in coda. Restituisce False allo scadere del timeout."""
+        deadline = time.ticks_add(time.ticks_ms(), timeout_ms)
+        while not self._commands_idle():
+            remaining = time.ticks_diff(deadline, time.ticks_ms())
+            if remaining <= 0 or not self.connected:
+                return False
+            await self._wait_event(min(remaining, self.conn_interval_ms))
+        return True
+
+    def stream(self):
+        """Iteratore asincrono dei pacchetti decodificati: async for frame in ble.stream()."""
+        return _FrameStream(self)
+
+
+class _FrameStream:
+    """Iteratore per async for (MicroPython non supporta i generatori asincroni)."""
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        manager = self._manager
+        while manager.connected or (manager.auto_reconnect and manager.adapter is not None):
+            try:
+                result = await manager.read_frame()
+            except EUCParseError:
+                continue  # Pacchetto corrotto: si passa al successivo senza interrompere il flusso
+            if result:
+                return result
+        raise StopAsyncIteration
@@ -0,0 +1,54 @@
+# micropython/examples/async_stream.py
+from micropython.ble_async import AsyncBLEManager
+from micropython.errors import BLEScanError, BLEConnectionError, BLECommunicationError
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+async def heartbeat():
+    # Esempio di altro task (display, logger, ...) che continua a girare durante le attese BLE
+    while True:
+        print("Heartbeat")
+        await asyncio.sleep_ms(1000)
+
+async def main():
+    try:
+        ble = AsyncBLEManager()
+    except Exception as e:
+        print(f"Errore inizializzazione BLE: {e}")
+        return
+
+    asyncio.create_task(heartbeat())
+    try:
+        print("Scansione dispositivi BLE...")
+        devices = await ble.scan(5000)
+        if not devices:
+            print("Nessun dispositivo trovato.")
+            return
+
+        selected = devices[0]
+        print(f"Connessione a {selected['name']} ({selected['mac']})...")
+        await ble.connect(selected['mac'], selected['euc_type'])
+        ble.auto_reconnect = True
+
+        async for result in ble.stream():
+            if "speed" in result:
+                print(f"Velocità: {result['speed']} km/h, "
+                      f"Batteria: {result['battery']}%, "
+                      f"Tensione: {result['voltage']}V")
+    except BLEScanError as e:
+        print(f"Errore scansione: {e}")
+    except BLEConnectionError as e:
+        print(f"Errore connessione: {e}")
+    except BLECommunicationError as e:
+        print(f"Errore comunicazione: {e}")
+    finally:
+        try:
+            ble.disconnect()
+            print("Disconnesso.")
+        except Exception as e:
+            print(f"Errore disconnessione: {e}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
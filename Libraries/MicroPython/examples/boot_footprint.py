@@ -0,0 +1,38 @@
+# micropython/examples/boot_footprint.py
+# Misura tempo di import e heap libero all'avvio: eseguire subito dopo un soft reset (Ctrl-D),
+# prima di qualsiasi altro import, per confrontare versioni diverse della libreria.
+import gc
+import sys
+import time
+
+BRANDS = ("inmotion", "kingsong", "gotway", "ninebot", "veteran")
+
+def measure(module):
+    """Importa module e restituisce (tempo in ms, byte di heap occupati)."""
+    gc.collect()
+    free = gc.mem_free()
+    start = time.ticks_us()
+    __import__(module)
+    elapsed = time.ticks_diff(time.ticks_us(), start) / 1000
+    gc.collect()
+    return elapsed, free - gc.mem_free()
+
+def main():
+    gc.collect()
+    print(f"Heap libero all'avvio: {gc.mem_free()} byte")
+    elapsed, used = measure("ble")
+    print(f"import ble: {elapsed:.1f} ms, {used} byte")
+    brand = sys.argv[1] if len(sys.argv) > 1 else "inmotion"
+    if brand not in BRANDS:
+        print(f"Marca non supportata: {brand} ({', '.join(BRANDS)})")
+        return
+    # Come BLEManager.select_adapter: si carica solo l'adattatore della marca connessa
+    elapsed, used = measure(f"EUC.{brand}")
+    print(f"import EUC.{brand}: {elapsed:.1f} ms, {used} byte")
+    loaded = [name for name in sys.modules if name.endswith("_constants")]
+    print(f"Tabelle caricate: {', '.join(loaded)}")
+    gc.collect()
+    print(f"Heap libero dopo gli import: {gc.mem_free()} byte")
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,8 @@
 from micropython.ble import BLEManager
 from micropython.errors import (
     BLEScanError, BLEConnectionError, BLECommunicationError,
-    EUCParseError, EUCCommandError
+    EUCCommandError
 )
-import time
 
 def main():
     try:
@@ -103,25 +102,20 @@ def main():
             except EUCCommandError as e:
                 print(f"Errore comando Veteran: {e}")
         
-        while True:
-            try:
-                data = ble.read()
-                if data:
-                    result = ble.adapter.decode(data)
-                    if result:
-                        print(f"Velocità: {result['speed']} km/h, "
-                              f"Batteria: {result['battery']}%, "
-                              f"Distanza: {result['distance']} km, "
-                              f"Temperatura: {result['temperature']}°C, "
-                              f"Corrente: {result['current']}A, "
-                              f"Tensione: {result['voltage']}V")
-            except (BLECommunicationError, EUCParseError) as e:
-                print(f"Errore comunicazione/parsing: {e}")
-                break
-            except KeyboardInterrupt:
-                print("Interruzione manuale.")
-                break
-            time.sleep_ms(100)
+        try:
+            # I pacchetti arrivano tramite notifiche, alla frequenza nativa della ruota
+            for result in ble.frames():
+                if "speed" in result:
+                    print(f"Velocità: {result['speed']} km/h, "
+                          f"Batteria: {result['battery']}%, "
+                          f"Distanza: {result['distance']} km, "
+                          f"Temperatura: {result['temperature']}°C, "
+                          f"Corrente: {result['current']}A, "
+                          f"Tensione: {result['voltage']}V")
+        except BLECommunicationError as e:
+            print(f"Errore comunicazione: {e}")
+        except KeyboardInterrupt:
+            print("Interruzione manuale.")
     
     except BLEScanError as e:
         print(f"Errore scansione: {e}")
@@ -2,9 +2,8 @@
 from micropython.ble import BLEManager
 from micropython.errors import (
     BLEScanError, BLEConnectionError, BLECommunicationError,
-    EUCParseError, EUCCommandError
+    EUCCommandError
 )
-import time
 
 def main():
     try:
@@ -31,12 +30,10 @@ def main():
             try:
                 ble.adapter.update_pedals_mode(1)  # Offroad
                 ble.adapter.set_lights(1)
-                ble.adapter.set_speed_alert(30.0)
                 ble.adapter.set_tiltback_alert(40.0)
                 ble.adapter.set_pedal_angle(2.3)  # Aggiornato per incrementi 0.1°
                 ble.adapter.activate_horn()
                 ble.adapter.request_serial_data()
-                ble.adapter.set_ride_mode(1)
                 ble.adapter.request_status()
                 ble.adapter.request_live_data()
                 print("Comandi InMotion eseguiti.")
@@ -102,25 +99,20 @@ def main():
             except EUCCommandError as e:
                 print(f"Errore comando Veteran: {e}")
         
-        while True:
-            try:
-                data = ble.read()
-                if data:
-                    result = ble.adapter.decode(data)
-                    if result:
-                        print(f"Velocità: {result['speed']} km/h, "
-                              f"Batteria: {result['battery']}%, "
-                              f"Distanza: {result['distance']} km, "
-                              f"Temperatura: {result['temperature']}°C, "
-                              f"Corrente: {result['current']}A, "
-                              f"Tensione: {result['voltage']}V")
-            except (BLECommunicationError, EUCParseError) as e:
-                print(f"Errore comunicazione/parsing: {e}")
-                break
-            except KeyboardInterrupt:
-                print("Interruzione manuale.")
-                break
-            time.sleep_ms(100)
+        try:
+            # I pacchetti arrivano tramite notifiche, alla frequenza nativa della ruota
+            for result in ble.frames():
+                if "speed" in result:
+                    print(f"Velocità: {result['speed']} km/h, "
+                          f"Batteria: {result['battery']}%, "
+                          f"Distanza: {result['distance']} km, "
+                          f"Temperatura: {result['temperature']}°C, "
+                          f"Corrente: {result['current']}A, "
+                          f"Tensione: {result['voltage']}V")
+        except BLECommunicationError as e:
+            print(f"Errore comunicazione: {e}")
+        except KeyboardInterrupt:
+            print("Interruzione manuale.")
     
     except BLEScanError as e:
         print(f"Errore scansione: {e}")
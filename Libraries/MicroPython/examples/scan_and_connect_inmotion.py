@@ -2,9 +2,8 @@
 from micropython.ble import BLEManager
 from micropython.errors import (
     BLEScanError, BLEConnectionError, BLECommunicationError,
-    EUCParseError, EUCCommandError
+    EUCCommandError
 )
-import time
 
 def main():
     try:
@@ -37,13 +36,9 @@ def main():
                 ble.adapter.set_lights(1)
                 print("Luci accese.")
                 
-                # Imposta allarme velocità
-                ble.adapter.set_speed_alert(30.0)  # 30 km/h
-                print("Allarme velocità impostato a 30 km/h.")
-                
-                # Imposta tilt-back (ipotetico)
+                # Imposta tilt-back (velocità massima)
                 ble.adapter.set_tiltback_alert(40.0)  # 40 km/h
-                print("Tilt-back impostato a 40 km/h (ipotetico).")
+                print("Tilt-back impostato a 40 km/h.")
                 
                 # Regola angolo pedane
                 ble.adapter.set_pedal_angle(2.0)  # +2°
@@ -57,10 +52,6 @@ def main():
                 ble.adapter.request_serial_data()
                 print("Richiesti dati seriali.")
                 
-                # Imposta modalità di guida (ipotetico)
-                ble.adapter.set_ride_mode(1)  # Normale
-                print("Modalità di guida impostata su normale (ipotetico).")
-                
                 # Richiedi stato
                 ble.adapter.request_status()
                 print("Richiesto stato.")
@@ -119,25 +110,22 @@ def main():
             except EUCCommandError as e:
                 print(f"Errore comando Veteran: {e}")
         
-        while True:
-            try:
-                data = ble.read()
-                if data:
-                    result = ble.adapter.decode(data)
-                    if result:
-                        print(f"Velocità: {result['speed']} km/h, "
-                              f"Batteria: {result['battery']}%, "
-                              f"Distanza: {result['distance']} km, "
-                              f"Temperatura: {result['temperature']}°C, "
-                              f"Corrente: {result['current']}A, "
-                              f"Tensione: {result['voltage']}V")
-            except (BLECommunicationError, EUCParseError) as e:
-                print(f"Errore comunicazione/parsing: {e}")
-                break
-            except KeyboardInterrupt:
-                print("Interruzione manuale.")
-                break
-            time.sleep_ms(100)
+        try:
+            # I pacchetti arrivano tramite notifiche, alla frequenza nativa della ruota
+            for result in ble.frames():
+                if "speed" in result:
+                    print(f"Velocità: {result['speed']} km/h, "
+                          f"Batteria: {result['battery']}%, "
+                          f"Distanza: {result['distance']} km, "
+                          f"Temperatura: {result['temperature']}°C, "
+                          f"Corrente: {result['current']}A, "
+                          f"Tensione: {result['voltage']}V")
+                    if selected['euc_type'] == "InMotion":
+                        ble.adapter.request_live_data()  # Chiede subito il messaggio successivo
+        except BLECommunicationError as e:
+            print(f"Errore comunicazione: {e}")
+        except KeyboardInterrupt:
+            print("Interruzione manuale.")
     
     except BLEScanError as e:
         print(f"Errore scansione: {e}")
@@ -1,10 +1,8 @@
-import os
-import re
-import struct
-import csv
-from datetime import datetime, timedelta
-from collections import defaultdict
+from itertools import islice
 import numpy as np
+from euc_world import load_euc_world_csv
+from nrf_log import log_status, parse_nrf_log, to_datetime
+from time_join import interval_groups, join_window
 
 def extract_ble_timestamps(ble_file, manual_date=None, timezone_offset_hours=2):
     """
@@ -18,69 +16,34 @@ def extract_ble_timestamps(ble_file, manual_date=None, timezone_offset_hours=2):
     Returns:
         tuple: (primo_timestamp, ultimo_timestamp) come oggetti datetime in UTC, o (None, None) se fallisce.
     """
-    first_ts = None
-    last_ts = None
-    line_count = 0
-    i_line_count = 0
-    date_str = manual_date
-
-    # Estrai la data dal nome file
-    if not date_str:
-        try:
-            filename = os.path.basename(ble_file)
-            date_match = re.search(r'(\d{4}-\d{2}-\d{2})', filename)
-            if date_match:
-                date_str = date_match.group(1)
-            else:
-                print(f"Errore: Impossibile estrarre la data dal nome file {ble_file}. Specifica manual_date (es. '2025-04-26').")
-                return None, None
-        except Exception as e:
-            print(f"Errore nel parsing del nome file {ble_file}: {str(e)}")
+    try:
+        status = log_status(ble_file)
+        if status == "vuoto":
+            print(f"Errore: Il file {ble_file} è vuoto")
+            return None, None
+        if status == "null":
+            print(f"Errore: Il file {ble_file} contiene solo 'null' o dati non validi")
+            return None, None
+        log = parse_nrf_log(ble_file, manual_date, timezone_offset_hours)
+        if log.date is None:
+            print(f"Errore: Impossibile estrarre la data dal nome file {ble_file}. Specifica manual_date (es. '2025-04-26').")
             return None, None
 
-    try:
-        with open(ble_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            if not content.strip():
-                print(f"Errore: Il file {ble_file} è vuoto")
-                return None, None
-            if "null" in content.lower() and len(content.strip()) < 100:
-                print(f"Errore: Il file {ble_file} contiene solo 'null' o dati non validi")
-                return None, None
-            
-            f.seek(0)
-            for line in f:
-                line_count += 1
-                if line.startswith('I'):
-                    i_line_count += 1
-                    ts_match = re.search(r'(\d{2}:\d{2}:\d{2}\.\d{3})', line)
-                    if ts_match:
-                        ts_str = ts_match.group(1)
-                        try:
-                            # Assumi che il timestamp BLE sia in CEST (+0200) e converti in UTC
-                            ts = datetime.strptime(f"{date_str} {ts_str}", '%Y-%m-%d %H:%M:%S.%f')
-                            ts = ts - timedelta(hours=timezone_offset_hours)  # Converti in UTC
-                            if first_ts is None:
-                                first_ts = ts
-                            last_ts = ts
-                        except ValueError as e:
-                            print(f"Errore nel parsing del timestamp alla riga {line_count}: {line.strip()} ({str(e)})")
-                            continue
-                    else:
-                        print(f"Riga 'I' senza timestamp valido alla riga {line_count}: {line.strip()}")
-        if first_ts and last_ts:
+        line_count = log.line_count
+        # Timestamp già convertiti in UTC dal parser (il telefono registra in CEST, +0200)
+        i_rows = np.flatnonzero(log.levels == ord('I'))
+        i_line_count = len(i_rows)
+        if i_line_count:
+            first_ts = to_datetime(log.timestamps[i_rows[0]])
+            last_ts = to_datetime(log.timestamps[i_rows[-1]])
             print(f"Trovati timestamp BLE (UTC): {first_ts} a {last_ts}")
             print(f"Analizzate {line_count} righe, {i_line_count} righe 'I'")
             return first_ts, last_ts
         else:
             print(f"Errore: Nessun timestamp valido trovato in {ble_file}")
             print(f"Analizzate {line_count} righe, {i_line_count} righe 'I'")
-            if i_line_count == 0:
-                print("Nessuna riga inizia con 'I'. Verifica il formato del file BLE.")
+            print("Nessuna riga inizia con 'I'. Verifica il formato del file BLE.")
             return None, None
-    except UnicodeDecodeError:
-        print(f"Errore: Problema di codifica nel file {ble_file}. Prova a convertirlo in UTF-8.")
-        return None, None
     except FileNotFoundError:
         print(f"Errore: File BLE {ble_file} non trovato")
         return None, None
@@ -97,39 +60,16 @@ def parse_ble_packets(ble_file, timezone_offset_hours=2):
         timezone_offset_hours (int): Offset del fuso orario in ore (es. 2 per CEST).
     
     Returns:
-        list: Lista di (timestamp, hex_packet, header) con timestamp in UTC.
+        NrfLog: Righe 'I' con valore, timestamp in UTC (vuoto se fallisce).
     """
-    packets = []
-    date_str = None
     try:
-        filename = os.path.basename(ble_file)
-        date_match = re.search(r'(\d{4}-\d{2}-\d{2})', filename)
-        if date_match:
-            date_str = date_match.group(1)
-        else:
+        log = parse_nrf_log(ble_file, timezone_offset_hours=timezone_offset_hours)
+        if log.date is None:
             print(f"Errore: Impossibile estrarre la data dal nome file {ble_file}.")
             return []
-
-        with open(ble_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.startswith('I'):
-                    ts_match = re.search(r'(\d{2}:\d{2}:\d{2}\.\d{3})', line)
-                    hex_match = re.search(r'\(0x\)\s*([0-9A-Fa-f\s\-]+)', line)
-                    if ts_match and hex_match:
-                        ts_str = ts_match.group(1)
-                        try:
-                            ts = datetime.strptime(f"{date_str} {ts_str}", '%Y-%m-%d %H:%M:%S.%f')
-                            ts = ts - timedelta(hours=timezone_offset_hours)  # Converti in UTC
-                            hex_str = hex_match.group(1).replace('-', '').replace(' ', '')
-                            header = hex_str[:4]  # Es. 'AAAA' o 'C07D'
-                            packets.append((ts, hex_str, header))
-                        except ValueError:
-                            continue
+        packets = log.select((log.levels == ord('I')) & (log.lengths() > 0))
         print(f"Caricati {len(packets)} pacchetti BLE")
         return packets
-    except UnicodeDecodeError:
-        print(f"Errore: Problema di codifica nel file {ble_file}. Prova a convertirlo in UTF-8.")
-        return []
     except FileNotFoundError:
         print(f"Errore: File BLE {ble_file} non trovato")
         return []
@@ -149,29 +89,28 @@ def parse_euc_world_csv(csv_file, first_ts, last_ts):
     Returns:
         list: Lista di dizionari con timestamp, chilometraggio, velocità, corrente, potenza.
     """
-    data = []
     try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            header = next(reader)
-            for row in reader:
-                try:
-                    ts_str = row[0].split('+')[0]  # Rimuove +0200
-                    ts = datetime.strptime(ts_str, '%Y-%m-%dT%H:%M:%S.%f')
-                    print(f"Timestamp CSV (UTC): {ts}")  # Debug
-                    if first_ts <= ts <= last_ts:
-                        entry = {
-                            'timestamp': ts,
-                            'mileage': float(row[4]),  # Colonna 4: distance_total
-                            'speed': float(row[5]),    # Colonna 5: speed
-                            'current': float(row[13]), # Colonna 13: current
-                            'power': float(row[15]),   # Colonna 15: power
-                            'voltage': float(row[12]), # Colonna 12: voltage
-                        }
-                        data.append(entry)
-                except (IndexError, ValueError) as e:
-                    print(f"Errore parsing riga CSV: {row[0]} ({str(e)})")
-                    continue
+        log = load_euc_world_csv(csv_file)
+        columns = {
+            'mileage': 4,   # Colonna 4: distance_total
+            'speed': 5,     # Colonna 5: speed
+            'current': 13,  # Colonna 13: current
+            'power': 15,    # Colonna 15: power
+            'voltage': 12,  # Colonna 12: voltage
+        }
+        first_ms = int(np.datetime64(first_ts, 'ms').astype(np.int64))
+        last_ms = int(np.datetime64(last_ts, 'ms').astype(np.int64))
+        in_range = (log.timestamps >= first_ms) & (log.timestamps <= last_ms)
+        values = log.values[:, list(columns.values())]
+        invalid = in_range & np.isnan(values).any(axis=1)
+        for line in log.lines[invalid].tolist():
+            print(f"Errore parsing riga CSV: riga {line} (valore mancante o non numerico)")
+        keep = in_range & ~invalid
+        data = []
+        for ms, row in zip(log.timestamps[keep].tolist(), values[keep].tolist()):
+            entry = {'timestamp': to_datetime(ms)}
+            entry.update(zip(columns, row))
+            data.append(entry)
         print(f"Caricato CSV: {len(data)} righe filtrate")
         return data
     except FileNotFoundError:
@@ -181,129 +120,105 @@ def parse_euc_world_csv(csv_file, first_ts, last_ts):
         print(f"Errore CSV: {str(e)}")
         return []
 
-def extract_values_from_packet(hex_packet):
-    """
-    Estrae byte, word (16-bit), e dword (32-bit) in little e big endian.
-    
-    Args:
-        hex_packet (str): Pacchetto esadecimale.
-    
-    Returns:
-        dict: Valori estratti con chiavi (tipo, indice, endian).
-    """
-    try:
-        packet = bytes.fromhex(hex_packet)
-    except ValueError:
-        return {}
-    
-    values = {}
-    for i in range(len(packet)):
-        values[('byte', i, 'none')] = packet[i]
-    for i in range(len(packet) - 1):
-        value_le = struct.unpack('<h', packet[i:i+2])[0]
-        value_be = struct.unpack('>h', packet[i:i+2])[0]
-        values[('word', i, 'le')] = value_le
-        values[('word', i, 'be')] = value_be
-    for i in range(len(packet) - 3):
-        value_le = struct.unpack('<i', packet[i:i+4])[0]
-        value_be = struct.unpack('>i', packet[i:i+4])[0]
-        values[('dword', i, 'le')] = value_le
-        values[('dword', i, 'be')] = value_be
-    return values
+# Campi del CSV correlati, con il range atteso di ciascuno
+FIELDS = ('mileage', 'speed', 'current', 'power')
+RANGES = np.array([10000.0, 100.0, 400.0, 30000.0])
+SCALES = (1, 10, 100, 1000, 0.1, 0.01)
+# Interpretazioni dei byte del pacchetto: (tipo, larghezza, endian, dtype NumPy)
+VALUE_TYPES = (
+    ('byte', 1, 'none', 'u1'),
+    ('word', 2, 'le', '<i2'),
+    ('word', 2, 'be', '>i2'),
+    ('dword', 4, 'le', '<i4'),
+    ('dword', 4, 'be', '>i4')
+)
+GROUP_INTERVAL_MS = 200  # Ampiezza dei gruppi di pacchetti
+WINDOW_MS = 100  # Distanza massima tra una riga CSV e l'inizio di un gruppo
+_CHUNK = 1 << 20  # Probabilità calcolate per blocco: limita la memoria dei prodotti in broadcast
 
-def calculate_probability(csv_value, ble_value, value_range):
+def extract_packet_values(packets):
     """
-    Calcola la probabilità che ble_value rappresenti csv_value.
+    Estrae in blocco byte, word (16-bit) e dword (32-bit, con segno) in little e big endian
+    a ogni offset di ogni pacchetto, con finestre scorrevoli sulla matrice dei pacchetti.
     
     Args:
-        csv_value (float): Valore dal CSV.
-        ble_value (float): Valore dal BLE.
-        value_range (float): Range atteso del valore.
+        packets (NrfLog): Pacchetti BLE.
     
     Returns:
-        float: Probabilità (0-1).
-    """
-    if value_range == 0:
-        return 0.0
-    distance = abs(csv_value - ble_value)
-    normalized_distance = distance / value_range
-    probability = max(0, 1 - normalized_distance)
-    return probability
-
-def group_packets_by_interval(packets, interval_ms=200):
+        tuple: (keys, values, valid): keys è la lista di (tipo, indice, endian) di ogni colonna,
+            values la matrice float64 (pacchetti x colonne), valid indica i valori interni al pacchetto.
     """
-    Raggruppa pacchetti BLE in intervalli di 200 ms.
-    
-    Args:
-        packets (list): Lista di (timestamp, hex_packet, header).
-        interval_ms (int): Intervallo in millisecondi.
+    lengths = packets.lengths()
+    width = max(int(lengths.max()) if len(lengths) else 0, 4)
+    # Pacchetti allineati a sinistra in una matrice, con zeri oltre la fine
+    matrix = np.zeros((len(packets), width), dtype=np.uint8)
+    inside = np.arange(width) < lengths[:, None]
+    matrix[inside] = np.frombuffer(packets.payloads, dtype=np.uint8)
     
-    Returns:
-        list: Lista di (start_ts, [(ts, hex_packet, header)]).
-    """
-    if not packets:
-        return []
-    
-    grouped = []
-    current_group = []
-    current_start = packets[0][0]
-    
-    for packet in packets:
-        ts, hex_packet, header = packet
-        if (ts - current_start).total_seconds() * 1000 <= interval_ms:
-            current_group.append(packet)
-        else:
-            grouped.append((current_start, current_group))
-            current_group = [packet]
-            current_start = ts
-    if current_group:
-        grouped.append((current_start, current_group))
-    
-    return grouped
+    keys, columns, valid = [], [], []
+    for value_type, size, endian, dtype in VALUE_TYPES:
+        windows = np.lib.stride_tricks.sliding_window_view(matrix, size, axis=1)
+        columns.append(np.ascontiguousarray(windows).view(dtype)[..., 0])
+        valid.append(np.arange(width - size + 1) + size <= lengths[:, None])
+        keys += [(value_type, i, endian) for i in range(width - size + 1)]
+    return keys, np.hstack(columns).astype(np.float64), np.hstack(valid)
 
 def correlate_ble_csv(ble_packets, csv_data, output_file="ble_correlation_output.txt"):
     """
     Correla pacchetti BLE raggruppati con righe CSV e assegna probabilità.
     
+    Per ogni riga CSV si prendono i pacchetti dei gruppi iniziati entro ±100 ms; ogni valore
+    del pacchetto, diviso per ogni scala, riceve per ogni campo la probabilità
+    max(0, 1 - |csv - valore| / range). Le probabilità positive si sommano per
+    (tipo, indice, endian, campo, scala, header) e il risultato è la loro media.
+    
     Args:
-        ble_packets (list): Lista di (timestamp, hex_packet, header).
+        ble_packets (NrfLog): Pacchetti BLE (vedi parse_ble_packets).
         csv_data (list): Lista di dizionari CSV.
         output_file (str): File di output.
+    
+    Returns:
+        list: ((tipo, indice, endian, campo, scala, header), probabilità) in ordine decrescente.
     """
-    ranges = {
-        'mileage': 10000.0,
-        'speed': 100.0,
-        'current': 400.0,
-        'power': 30000.0,
-    }
+    keys, values, valid = extract_packet_values(ble_packets)
+    # Header: primi 2 byte del pacchetto in esadecimale (es. 'AAAA' o 'C07D')
+    headers = [ble_packets.hex(i)[:4] for i in range(len(ble_packets))]
+    header_names, header_ids = np.unique(headers, return_inverse=True)
+    header_ids = header_ids.ravel()
     
-    probabilities = defaultdict(list)
-    grouped_packets = group_packets_by_interval(ble_packets)
+    csv_ts = np.array([np.datetime64(entry['timestamp'], 'ms') for entry in csv_data], dtype='datetime64[ms]').astype(np.int64)
+    csv_values = np.array([[entry[field] for field in FIELDS] for entry in csv_data], dtype=np.float64).reshape(-1, len(FIELDS))
     
-    for csv_entry in csv_data:
-        csv_ts = csv_entry['timestamp']
-        window_start = csv_ts - timedelta(milliseconds=100)
-        window_end = csv_ts + timedelta(milliseconds=100)
-        
-        for group_start, group in grouped_packets:
-            if window_start <= group_start <= window_end:
-                for _, hex_packet, header in group:
-                    ble_values = extract_values_from_packet(hex_packet)
-                    for (value_type, index, endian), ble_value in ble_values.items():
-                        for csv_field in ['mileage', 'speed', 'current', 'power']:
-                            csv_value = csv_entry[csv_field]
-                            for scale in [1, 10, 100, 1000, 0.1, 0.01]:
-                                scaled_ble_value = ble_value / scale
-                                prob = calculate_probability(csv_value, scaled_ble_value, ranges[csv_field])
-                                if prob > 0:
-                                    probabilities[(value_type, index, endian, csv_field, scale, header)].append(prob)
+    # Pacchetti di ogni riga CSV: quelli dei gruppi da 200 ms iniziati entro ±100 ms dalla riga
+    group_starts = interval_groups(ble_packets.timestamps, GROUP_INTERVAL_MS)
+    pair_rows, pair_packets = join_window(csv_ts, group_starts, WINDOW_MS, WINDOW_MS)
     
-    aggregated_probs = {}
-    for key, probs in probabilities.items():
-        mean_prob = np.mean(probs)
-        aggregated_probs[key] = mean_prob
+    # Somme e conteggi correnti per (header, colonna, campo, scala)
+    scales = np.array(SCALES, dtype=np.float64)
+    cell = values.shape[1] * len(FIELDS) * len(SCALES)
+    sums = np.zeros(len(header_names) * cell)
+    hits = np.zeros(len(header_names) * cell)
+    step = max(1, _CHUNK // cell)
+    for start in range(0, len(pair_rows), step):
+        rows = pair_rows[start:start + step]
+        packets = pair_packets[start:start + step]
+        scaled = values[packets][:, :, None, None] / scales  # (coppie, colonne, 1, scale)
+        probs = 1 - np.abs(csv_values[rows][:, None, :, None] - scaled) / RANGES[:, None]
+        probs = np.where(valid[packets][:, :, None, None] & (probs > 0), probs, 0.0)
+        index = (header_ids[packets] * cell)[:, None] + np.arange(cell)
+        sums += np.bincount(index.ravel(), weights=probs.ravel(), minlength=len(sums))
+        hits += np.bincount(index.ravel(), weights=(probs > 0).ravel(), minlength=len(hits))
     
-    sorted_probs = sorted(aggregated_probs.items(), key=lambda x: x[1], reverse=True)
+    found = np.flatnonzero(hits)
+    means = sums[found] / hits[found]
+    found = found[np.argsort(-means, kind='stable')]
+    header, rest = np.divmod(found, cell)
+    column, rest = np.divmod(rest, len(FIELDS) * len(SCALES))
+    field, scale = np.divmod(rest, len(SCALES))
+    header_names = header_names.tolist()
+    sorted_probs = [(keys[c] + (FIELDS[f], SCALES[s], header_names[h]), p)
+                    for p, h, c, f, s in zip((sums[found] / hits[found]).tolist(), header.tolist(), column.tolist(),
+                                             field.tolist(), scale.tolist())]
     
     try:
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -312,7 +227,7 @@ def correlate_ble_csv(ble_packets, csv_data, output_file="ble_correlation_output
             f.write("Probabilità per campo (top 5 per campo):\n")
             for csv_field in ['mileage', 'speed', 'current', 'power']:
                 f.write(f"\n{csv_field.upper()}:\n")
-                field_probs = [(k, p) for k, p in sorted_probs if k[3] == csv_field][:5]
+                field_probs = list(islice(((k, p) for k, p in sorted_probs if k[3] == csv_field), 5))
                 for (value_type, index, endian, _, scale, header), prob in field_probs:
                     f.write(f"Tipo: {value_type}, Indice: {index}, Endian: {endian}, Scala: {scale}, Header: {header}, Probabilità: {prob:.4f}\n")
             f.write("\nEventi di frenata (current < 0, deltaV < -1 km/h):\n")
@@ -368,7 +283,7 @@ def main():
     print("\nMigliori corrispondenze (top 5 per campo):")
     for csv_field in ['mileage', 'speed', 'current', 'power']:
         print(f"\n{csv_field.upper()}:")
-        field_probs = [(k, p) for k, p in sorted_probs if k[3] == csv_field][:5]
+        field_probs = list(islice(((k, p) for k, p in sorted_probs if k[3] == csv_field), 5))
         for (value_type, index, endian, _, scale, header), prob in field_probs:
             print(f"Tipo: {value_type}, Indice: {index}, Endian: {endian}, Scala: {scale}, Header: {header}, Probabilità: {prob:.4f}")
 
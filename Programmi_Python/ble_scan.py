@@ -1,7 +1,7 @@
-import os
-import re
 import struct
 from datetime import datetime
+import numpy as np
+from nrf_log import parse_nrf_log
 
 def find_value_in_log(file_path, target_value=12954.238, tolerance=50, max_results=10, output_file="ble_search_output.txt", search_device_info=True, search_battery=True, search_proprietary=True):
     """
@@ -34,92 +34,85 @@ def find_value_in_log(file_path, target_value=12954.238, tolerance=50, max_resul
     }
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                if line.startswith('A'):
-                    continue
-                if '(0x)' not in line:
-                    continue
-                hex_match = re.search(r'\(0x\)\s*([0-9A-Fa-f\s\-]+)', line)
-                if not hex_match:
-                    continue
-                
-                hex_str = hex_match.group(1).replace('-', '').replace(' ', '')
-                try:
-                    packet = bytes.fromhex(hex_str)
-                except ValueError:
-                    continue
+        log = parse_nrf_log(file_path)
+        # UUID della caratteristica di ogni riga ('' se assente)
+        uuids = [log.characteristics[c] if c >= 0 else '' for c in log.chars.tolist()]
+        for i in np.flatnonzero((log.levels != ord('A')) & (log.lengths() > 0)).tolist():
+            line_num = int(log.lines[i])
+            uuid_line = uuids[i]
+            hex_str = log.hex(i)
+            packet = bytes(log.payload(i))
 
-                packet_counts['total'] += 1
-                packet_key = hex_str.lower()  # Chiave per deduplicazione
+            packet_counts['total'] += 1
+            packet_key = hex_str.lower()  # Chiave per deduplicazione
 
-                # Chilometraggio (Sherman Max)
-                if target_value and search_proprietary and len(packet) >= 16 and packet[0] == 0x0D and packet[1] in [0x8F, 0x90, 0x91, 0x92, 0x87, 0x88, 0xFA, 0xFB]:
-                    packet_counts['short'] += 1
-                    if packet_key in seen_packets:
-                        continue
-                    seen_packets.add(packet_key)
-                    # Prova byte 5-8
-                    value_le = struct.unpack('<I', packet[5:9])[0]
-                    value_be = struct.unpack('>I', packet[5:9])[0]
-                    for value in [value_le, value_be]:
-                        if abs(value - target) <= tolerance:
-                            results.append(f"Riga {line_num}, Byte 5-8, 32-bit: {value} (target {target}, scala {scale}, diff {value - target})")
-                            results.append(f"Pacchetto: {hex_str}")
-                            results.append(f"Linea completa: {line.strip()}")
-                    # Prova byte 9-12
-                    value_le = struct.unpack('<I', packet[9:13])[0]
-                    value_be = struct.unpack('>I', packet[9:13])[0]
-                    for value in [value_le, value_be]:
-                        if abs(value - target) <= tolerance:
-                            results.append(f"Riga {line_num}, Byte 9-12, 32-bit: {value} (target {target}, scala {scale}, diff {value - target})")
-                            results.append(f"Pacchetto: {hex_str}")
-                            results.append(f"Linea completa: {line.strip()}")
+            # Chilometraggio (Sherman Max)
+            if target_value and search_proprietary and len(packet) >= 16 and packet[0] == 0x0D and packet[1] in [0x8F, 0x90, 0x91, 0x92, 0x87, 0x88, 0xFA, 0xFB]:
+                packet_counts['short'] += 1
+                if packet_key in seen_packets:
+                    continue
+                seen_packets.add(packet_key)
+                # Prova byte 5-8
+                value_le = struct.unpack('<I', packet[5:9])[0]
+                value_be = struct.unpack('>I', packet[5:9])[0]
+                for value in [value_le, value_be]:
+                    if abs(value - target) <= tolerance:
+                        results.append(f"Riga {line_num}, Byte 5-8, 32-bit: {value} (target {target}, scala {scale}, diff {value - target})")
+                        results.append(f"Pacchetto: {hex_str}")
+                        results.append(f"Linea completa: {log.line(i)}")
+                # Prova byte 9-12
+                value_le = struct.unpack('<I', packet[9:13])[0]
+                value_be = struct.unpack('>I', packet[9:13])[0]
+                for value in [value_le, value_be]:
+                    if abs(value - target) <= tolerance:
+                        results.append(f"Riga {line_num}, Byte 9-12, 32-bit: {value} (target {target}, scala {scale}, diff {value - target})")
+                        results.append(f"Pacchetto: {hex_str}")
+                        results.append(f"Linea completa: {log.line(i)}")
 
-                # Device Information
-                if search_device_info:
-                    for uuid in ['00002a23', '00002a24', '00002a25', '00002a26', '00002a29']:
-                        if uuid in line:
-                            packet_counts['device_info'] += 1
-                            if packet_key in seen_packets:
-                                continue
-                            seen_packets.add(packet_key)
-                            try:
-                                decoded = bytes.fromhex(hex_str).decode('ascii').strip('\x00')
-                                results.append(f"Riga {line_num}, {uuid}: {decoded}")
-                            except:
-                                results.append(f"Riga {line_num}, {uuid} (non-ASCII): {hex_str}")
-                            results.append(f"Linea completa: {line.strip()}")
+            # Device Information
+            if search_device_info:
+                for uuid in ['00002a23', '00002a24', '00002a25', '00002a26', '00002a29']:
+                    if uuid_line.startswith(uuid):
+                        packet_counts['device_info'] += 1
+                        if packet_key in seen_packets:
+                            continue
+                        seen_packets.add(packet_key)
+                        try:
+                            decoded = bytes.fromhex(hex_str).decode('ascii').strip('\x00')
+                            results.append(f"Riga {line_num}, {uuid}: {decoded}")
+                        except:
+                            results.append(f"Riga {line_num}, {uuid} (non-ASCII): {hex_str}")
+                        results.append(f"Linea completa: {log.line(i)}")
 
-                # Battery Level
-                if search_battery and '00002a19' in line:
-                    packet_counts['battery'] += 1
+            # Battery Level
+            if search_battery and uuid_line.startswith('00002a19'):
+                packet_counts['battery'] += 1
+                if packet_key in seen_packets:
+                    continue
+                seen_packets.add(packet_key)
+                if len(packet) >= 1:
+                    battery_level = packet[0]
+                    results.append(f"Riga {line_num}, Battery Level: {battery_level}%")
+                    results.append(f"Pacchetto: {hex_str}")
+                    results.append(f"Linea completa: {log.line(i)}")
+
+            # Proprietario (Sherman Max)
+            if search_proprietary and uuid_line.startswith('0000ffe1'):
+                if len(packet) >= 20 and packet[0] == 0xDC and packet[1] == 0x5A:
+                    packet_counts['long'] += 1
                     if packet_key in seen_packets:
                         continue
                     seen_packets.add(packet_key)
-                    if len(packet) >= 1:
-                        battery_level = packet[0]
-                        results.append(f"Riga {line_num}, Battery Level: {battery_level}%")
-                        results.append(f"Pacchetto: {hex_str}")
-                        results.append(f"Linea completa: {line.strip()}")
+                    voltage = (packet[13] | (packet[14] << 8)) / 0.3309
+                    battery = (packet[17] | (packet[18] << 8)) / 27.6
+                    temp = (packet[15] | (packet[16] << 8)) / 7.3
+                    results.append(f"Riga {line_num}, Tensione: {voltage:.2f} V, Batteria: {battery:.0f}%, Temperatura: {temp:.0f}°C")
+                    results.append(f"Pacchetto: {hex_str}")
+                    results.append(f"Linea completa: {log.line(i)}")
 
-                # Proprietario (Sherman Max)
-                if search_proprietary and '0000ffe1' in line.lower():
-                    if len(packet) >= 20 and packet[0] == 0xDC and packet[1] == 0x5A:
-                        packet_counts['long'] += 1
-                        if packet_key in seen_packets:
-                            continue
-                        seen_packets.add(packet_key)
-                        voltage = (packet[13] | (packet[14] << 8)) / 0.3309
-                        battery = (packet[17] | (packet[18] << 8)) / 27.6
-                        temp = (packet[15] | (packet[16] << 8)) / 7.3
-                        results.append(f"Riga {line_num}, Tensione: {voltage:.2f} V, Batteria: {battery:.0f}%, Temperatura: {temp:.0f}°C")
-                        results.append(f"Pacchetto: {hex_str}")
-                        results.append(f"Linea completa: {line.strip()}")
+            if len(seen_packets) >= max_results and not (search_device_info or search_battery or search_proprietary):
+                break
 
-                if len(seen_packets) >= max_results and not (search_device_info or search_battery or search_proprietary):
-                    break
-    
     except FileNotFoundError:
         print(f"Errore: File {file_path} non trovato")
         return []
@@ -1,6 +1,6 @@
-import os
-import re
 import struct
+import numpy as np
+from nrf_log import parse_nrf_log
 
 def find_value_in_log(file_path, target_value, tolerance=50, max_results=5, output_file="ble_search_output.txt", filter_prefix=True):
     """
@@ -23,43 +23,33 @@ def find_value_in_log(file_path, target_value, tolerance=50, max_results=5, outp
     seen_packets = set()  # Deduplicazione
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                # Ignora righe "A"
-                if line.startswith('A'):
+        log = parse_nrf_log(file_path)
+        # Ignora righe "A" e righe senza valore
+        for i in np.flatnonzero((log.levels != ord('A')) & (log.lengths() > 0)).tolist():
+            line_num = int(log.lines[i])
+            hex_str = log.hex(i)
+            packet = bytes(log.payload(i))
+            
+            # Filtro opzionale per InMotion
+            if filter_prefix and len(packet) >= 7:
+                if packet[:3] != b'\x00\x00\x00' and (len(packet) < 8 or packet[:4] != b'\x00\x00\x00\x00'):
                     continue
-                if '(0x)' not in line:
-                    continue
-                hex_match = re.search(r'\(0x\)\s*([0-9A-Fa-f\s\-]+)', line)
-                if not hex_match:
-                    continue
-                
-                hex_str = hex_match.group(1).replace('-', '').replace(' ', '')
-                try:
-                    packet = bytes.fromhex(hex_str)
-                except ValueError:
-                    continue
-                
-                # Filtro opzionale per InMotion
-                if filter_prefix and len(packet) >= 7:
-                    if packet[:3] != b'\x00\x00\x00' and (len(packet) < 8 or packet[:4] != b'\x00\x00\x00\x00'):
-                        continue
-                
-                # Cerca in 32-bit LE
-                for offset in [3, 4]:
-                    if offset + 3 < len(packet):
-                        value_le = struct.unpack('<I', packet[offset:offset+4])[0]
-                        if abs(value_le - target) <= tolerance:
-                            if hex_str not in seen_packets:
-                                results.append(f"Riga {line_num}, Byte {offset}-{offset+3}, 32-bit LE: {value_le} (target {target}, scala {scale}, diff {value_le - target})")
-                                results.append(f"Pacchetto: {hex_str}")
-                                results.append(f"Linea completa: {line.strip()}")
-                                seen_packets.add(hex_str)
-                
-                # Ferma dopo max_results
-                if len(seen_packets) >= max_results:
-                    break
-    
+            
+            # Cerca in 32-bit LE
+            for offset in [3, 4]:
+                if offset + 3 < len(packet):
+                    value_le = struct.unpack('<I', packet[offset:offset+4])[0]
+                    if abs(value_le - target) <= tolerance:
+                        if hex_str not in seen_packets:
+                            results.append(f"Riga {line_num}, Byte {offset}-{offset+3}, 32-bit LE: {value_le} (target {target}, scala {scale}, diff {value_le - target})")
+                            results.append(f"Pacchetto: {hex_str}")
+                            results.append(f"Linea completa: {log.line(i)}")
+                            seen_packets.add(hex_str)
+            
+            # Ferma dopo max_results
+            if len(seen_packets) >= max_results:
+                break
+
     except FileNotFoundError:
         print(f"Errore: File {file_path} non trovato")
         return []
@@ -1,8 +1,9 @@
-import os
-import re
 import struct
 import csv
 from datetime import datetime
+import numpy as np
+from euc_world import load_euc_world_csv
+from nrf_log import log_status, parse_nrf_log, to_datetime, WRITE
 
 def extract_ble_timestamps(ble_file):
     """
@@ -17,21 +18,11 @@ def extract_ble_timestamps(ble_file):
     first_ts = None
     last_ts = None
     try:
-        with open(ble_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                ts_match = re.search(r'(\d{2}:\d{2}:\d{2}\.\d{3})', line)
-                if ts_match:
-                    ts_str = ts_match.group(1)
-                    # Assumi la data dal nome del file (es. 2025-04-25)
-                    date_str = os.path.basename(ble_file).split('_-_')[-1].split('.')[0]
-                    date_str = date_str.replace('_', ':')[:10]  # Prendi solo la data (2025-04-25)
-                    try:
-                        ts = datetime.strptime(f"{date_str} {ts_str}", '%Y-%m-%d %H:%M:%S.%f')
-                        if first_ts is None:
-                            first_ts = ts
-                        last_ts = ts
-                    except ValueError:
-                        continue
+        # Data dall'intestazione del log o dal nome del file (es. 2025-04-25)
+        log = parse_nrf_log(ble_file)
+        if log.date and len(log):
+            first_ts = to_datetime(log.timestamps[0])
+            last_ts = to_datetime(log.timestamps[-1])
         if first_ts and last_ts:
             print(f"Trovati timestamp BLE: {first_ts} a {last_ts}")
             return first_ts, last_ts
@@ -85,27 +76,16 @@ def parse_euc_world_csv(csv_file):
     Returns:
         list: Lista di dizionari con timestamp, chilometraggio, inclinazione, ecc.
     """
-    data = []
     try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            header = next(reader)  # Salta l'intestazione
-            for row in reader:
-                try:
-                    ts_str = row[0].split('+')[0]
-                    ts = datetime.strptime(ts_str, '%Y-%m-%dT%H:%M:%S.%f')
-                    entry = {
-                        'timestamp': ts,
-                        'mileage': float(row[4]),
-                        'tilt': float(row[13]),
-                        'speed': float(row[5]),
-                        'voltage': float(row[11]),
-                        'current': float(row[12]),
-                        'temperature': float(row[15])
-                    }
-                    data.append(entry)
-                except (IndexError, ValueError):
-                    continue
+        log = load_euc_world_csv(csv_file)
+        columns = {'mileage': 4, 'tilt': 13, 'speed': 5, 'voltage': 11, 'current': 12, 'temperature': 15}
+        values = log.values[:, list(columns.values())]
+        valid = ~np.isnan(values).any(axis=1)  # Come prima: si scartano le righe con un valore mancante
+        data = []
+        for ms, row in zip(log.timestamps[valid].tolist(), values[valid].tolist()):
+            entry = {'timestamp': to_datetime(ms)}
+            entry.update(zip(columns, row))
+            data.append(entry)
         print(f"Caricato CSV: {len(data)} righe")
         return data
     except FileNotFoundError:
@@ -175,45 +155,41 @@ def find_value_in_log(ble_file, csv_file, mileage, tolerance=0.5, output_file="b
     match_count = 0
     
     try:
-        with open(ble_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            if "null" in content.lower() and len(content.strip()) < 100:
-                results.append("Errore: Log BLE vuoto o contiene solo 'null'. Riprova a registrare.")
-                return results
-            
-            f.seek(0)
-            for line_num, line in enumerate(f, 1):
-                hex_match = re.search(r'\(0x\)\s*([0-9A-Fa-f\s\-]+)', line)
-                if hex_match:
-                    hex_str = hex_match.group(1).replace('-', '').replace(' ', '')
-                    try:
-                        packet = bytes.fromhex(hex_str)
-                    except ValueError:
-                        continue
-                    
-                    if len(packet) < 4 or (packet[0:3] != b'\x00\x00\x00' and packet[0:2] != b'\x55\xAA'):
-                        continue
-                    
-                    for i in range(len(packet) - 3):
-                        if i + 3 < len(packet):
-                            value_le = struct.unpack('<I', packet[i:i+4])[0]
-                            for scale, target in zip(scales, target_values):
-                                if abs(value_le - target) <= tolerance_units and match_count < max_matches:
-                                    results.append(f"Riga {line_num}, Byte {i}-{i+3}, 32-bit LE: {value_le} (target {target}, scala {scale}, diff {value_le - target})")
-                                    results.append(f"Pacchetto: {hex_str}")
-                                    results.append(f"Linea completa: {line.strip()}")
-                                    match_count += 1
-                    
-                    for i in range(len(packet) - 1):
-                        if i + 1 < len(packet):
-                            value_be = struct.unpack('>H', packet[i:i+2])[0]
-                            if -1000 <= value_be <= 1000:  # -10.0° a +10.0°
-                                results.append(f"Riga {line_num}, Byte {i}-{i+1}, 16-bit BE: {value_be} (possibile inclinazione: {value_be/100.0}°)")
+        if log_status(ble_file):
+            results.append("Errore: Log BLE vuoto o contiene solo 'null'. Riprova a registrare.")
+            return results
+
+        log = parse_nrf_log(ble_file)
+        lengths = log.lengths()
+        for row in range(len(log)):
+            line_num = int(log.lines[row])
+            if lengths[row]:
+                hex_str = log.hex(row)
+                packet = bytes(log.payload(row))
+                
+                if len(packet) < 4 or (packet[0:3] != b'\x00\x00\x00' and packet[0:2] != b'\x55\xAA'):
+                    continue
+                
+                for i in range(len(packet) - 3):
+                    if i + 3 < len(packet):
+                        value_le = struct.unpack('<I', packet[i:i+4])[0]
+                        for scale, target in zip(scales, target_values):
+                            if abs(value_le - target) <= tolerance_units and match_count < max_matches:
+                                results.append(f"Riga {line_num}, Byte {i}-{i+3}, 32-bit LE: {value_le} (target {target}, scala {scale}, diff {value_le - target})")
                                 results.append(f"Pacchetto: {hex_str}")
-                                results.append(f"Linea completa: {line.strip()}")
+                                results.append(f"Linea completa: {log.line(row)}")
+                                match_count += 1
                 
-                if 'Write command' in line or 'Write request' in line:
-                    results.append(f"Riga {line_num}, Possibile comando di scrittura (handshake): {line.strip()}")
+                for i in range(len(packet) - 1):
+                    if i + 1 < len(packet):
+                        value_be = struct.unpack('>H', packet[i:i+2])[0]
+                        if -1000 <= value_be <= 1000:  # -10.0° a +10.0°
+                            results.append(f"Riga {line_num}, Byte {i}-{i+1}, 16-bit BE: {value_be} (possibile inclinazione: {value_be/100.0}°)")
+                            results.append(f"Pacchetto: {hex_str}")
+                            results.append(f"Linea completa: {log.line(row)}")
+            
+            if log.kinds[row] == WRITE:
+                results.append(f"Riga {line_num}, Possibile comando di scrittura (handshake): {log.line(row)}")
 
     except FileNotFoundError:
         print(f"Errore: File BLE {ble_file} non trovato")
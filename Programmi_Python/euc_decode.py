@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+import numpy as np
+
+# I layout dei pacchetti sono gli stessi usati dagli adattatori MicroPython
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Libraries", "MicroPython"))
+from EUC import gotway_constants, inmotion_constants, kingsong_constants, ninebot_constants, veteran_constants
+
+# Campi dei dati live per marca (sulla scheda ogni adattatore carica solo la propria tabella)
+LIVE_DATA_FIELDS = {
+    "InMotion": inmotion_constants.LIVE_DATA_FIELDS,
+    "Kingsong": kingsong_constants.LIVE_DATA_FIELDS,
+    "Gotway": gotway_constants.LIVE_DATA_FIELDS,
+    "Ninebot": ninebot_constants.LIVE_DATA_FIELDS,
+    "Veteran": veteran_constants.LIVE_DATA_FIELDS
+}
+
+# Tipi NumPy per (larghezza in byte, con segno)
+_KINDS = {
+    (1, False): "u1", (1, True): "i1",
+    (2, False): "u2", (2, True): "i2",
+    (4, False): "u4", (4, True): "i4"
+}
+
+# Header dei pacchetti per marca (come HEADER negli adattatori). InMotion non c'è: i suoi
+# messaggi hanno lunghezza variabile e byte di escape, vanno estratti dall'adattatore
+HEADERS = {
+    "Kingsong": b"\xAA\x55",
+    "Gotway": b"\x55\xAA",
+    "Ninebot": b"\x5A\xA5",
+    "Veteran": b"\xDC\x5A\x5C"
+}
+
+# Lunghezza dei pacchetti di dati live per marca, se diversa da 20 byte
+FRAME_LENGTHS = {
+    "InMotion": 149,  # Dati estesi di GetFastInfo (V10F)
+    "Veteran": 36
+}
+
+# Marche con campi little endian
+LITTLE_ENDIAN = ("InMotion",)
+
+# Posizione e valore del tipo di risposta dei dati live (come _LIVE_DATA negli adattatori):
+# i pacchetti di numero di serie, firmware o altro hanno lo stesso header e vanno scartati
+LIVE_RESPONSE = {
+    "Kingsong": (16, 0x9B),
+    "Gotway": (16, 0x04),
+    "Ninebot": (2, 0x01)
+}
+
+# Marche con checksum nell'ultimo byte (somma dei byte precedenti, modulo 256)
+CHECKSUM = ("Ninebot",)
+
+def valid_frames(frames, brand):
+    """
+    Maschera dei pacchetti integri: checksum corretta per le marche che la prevedono e,
+    per Veteran, byte di lunghezza coerente con la lunghezza del pacchetto.
+
+    Args:
+        frames (np.ndarray): Matrice (n, frame_length) di uint8.
+        brand (str): Marca.
+
+    Returns:
+        np.ndarray: Array booleano di n elementi.
+    """
+    mask = np.ones(len(frames), dtype=bool)
+    if brand in CHECKSUM:
+        mask &= (frames[:, :-1].sum(axis=1, dtype=np.int64) & 0xFF) == frames[:, -1]
+    if brand == "Veteran":
+        mask &= frames[:, 3].astype(np.int64) + 4 == frames.shape[1]  # Come _frame_length dell'adattatore
+    return mask
+
+def live_frames(frames, brand):
+    """
+    Maschera dei pacchetti di dati live: integri (vedi valid_frames) e con il tipo di risposta
+    dei dati live, come controllato da _parse_frame negli adattatori.
+
+    Args:
+        frames (np.ndarray): Matrice (n, frame_length) di uint8.
+        brand (str): Marca.
+
+    Returns:
+        np.ndarray: Array booleano di n elementi.
+    """
+    mask = valid_frames(frames, brand)
+    if brand in LIVE_RESPONSE:
+        position, code = LIVE_RESPONSE[brand]
+        mask &= frames[:, position] == code
+    return mask
+
+def layout_dtype(fields, frame_length=20, big_endian=True):
+    """
+    Crea il dtype strutturato NumPy corrispondente a un layout di LIVE_DATA_FIELDS.
+
+    Args:
+        fields (tuple): Campi (nome, offset, larghezza, con segno, divisore).
+        frame_length (int): Lunghezza del pacchetto in byte.
+        big_endian (bool): Ordine dei byte dei campi.
+
+    Returns:
+        np.dtype: Dtype con un campo per ogni valore, agli offset del pacchetto.
+    """
+    order = ">" if big_endian else "<"
+    return np.dtype({
+        "names": [field[0] for field in fields],
+        "formats": [(order + "u2", (2,)) if len(field) > 5 and field[5] else order + _KINDS[(field[2], field[3])]
+                    for field in fields],
+        "offsets": [field[1] for field in fields],
+        "itemsize": frame_length
+    })
+
+def decode_frames(data, brand, frame_length=None):
+    """
+    Decodifica in blocco un buffer contiguo di pacchetti a lunghezza fissa.
+
+    Args:
+        data (bytes | np.ndarray): Pacchetti consecutivi, già allineati all'header (per InMotion
+            i dati estesi dei messaggi GetFastInfo, senza escape).
+        brand (str): Marca (chiave di LIVE_DATA_FIELDS).
+        frame_length (int): Lunghezza del pacchetto in byte (default da FRAME_LENGTHS).
+
+    Returns:
+        dict: {campo: np.ndarray} con i valori già divisi per il divisore del campo. I pacchetti
+        che non sono dati live (numero di serie, firmware) o con checksum errata vengono saltati.
+    """
+    fields = LIVE_DATA_FIELDS[brand]
+    frame_length = frame_length or FRAME_LENGTHS.get(brand, 20)
+    raw = np.frombuffer(data, dtype=np.uint8) if not isinstance(data, np.ndarray) else data.reshape(-1)
+    count = len(raw) // frame_length
+    frames = raw[:count * frame_length].reshape(count, frame_length)
+    frames = np.ascontiguousarray(frames[live_frames(frames, brand)])
+    dtype = layout_dtype(fields, frame_length, big_endian=brand not in LITTLE_ENDIAN)
+    records = np.frombuffer(frames, dtype=dtype)
+    columns = {}
+    for field in fields:
+        name, divisor = field[0], field[4]
+        values = records[name]
+        if len(field) > 5 and field[5]:
+            # Parole da 16 bit invertite: la prima è quella meno significativa
+            values = values[:, 1].astype(np.int64) << 16 | values[:, 0]
+        columns[name] = values / divisor
+    return columns
+
+def frames_from_stream(data, header, frame_length=20, brand=None):
+    """
+    Estrae da un flusso grezzo i pacchetti che iniziano con header, scartando i byte spuri.
+
+    Args:
+        data (bytes): Flusso di byte ricevuti (es. notifiche concatenate).
+        header (bytes): Header del pacchetto.
+        frame_length (int): Lunghezza del pacchetto in byte.
+        brand (str): Marca; se indicata si tengono solo i pacchetti di dati live integri.
+
+    Returns:
+        np.ndarray: Matrice (n, frame_length) di uint8, contigua, pronta per decode_frames.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if len(raw) < frame_length:
+        return np.empty((0, frame_length), dtype=np.uint8)
+    last = len(raw) - frame_length
+    match = raw[:last + 1] == header[0]
+    for i in range(1, len(header)):
+        match &= raw[i:last + 1 + i] == header[i]
+    candidates = np.flatnonzero(match)
+    if brand:
+        # Come nel framer degli adattatori un pacchetto corrotto costa solo il suo header:
+        # si scarta prima di risolvere le sovrapposizioni, così non nasconde quello successivo
+        candidates = candidates[valid_frames(raw[candidates[:, None] + np.arange(frame_length)], brand)]
+    # Un header spurio dentro un pacchetto sovrappone due candidati: come nel framer degli
+    # adattatori vince il primo. Ogni passata scarta i candidati sovrapposti a un predecessore
+    # già confermato; nei flussi puliti non serve nessuna passata.
+    keep = np.ones(len(candidates), dtype=bool)
+    while True:
+        kept = np.flatnonzero(keep)
+        overlap = np.diff(candidates[kept]) < frame_length
+        if not overlap.any():
+            break
+        confirmed = np.concatenate(([True], ~overlap))
+        keep[kept[1:][overlap & confirmed[:-1]]] = False
+    frames = raw[candidates[keep][:, None] + np.arange(frame_length)]
+    if brand:
+        frames = frames[live_frames(frames, brand)]  # Serial e firmware occupano comunque il loro spazio
+    return frames
+
+def main():
+    capture_file = input("Inserisci il percorso del file binario dei pacchetti: ")
+    brand = input(f"Inserisci la marca ({', '.join(HEADERS)}): ")
+    if brand not in HEADERS:
+        print(f"Marca non supportata: {brand}")
+        return
+
+    with open(capture_file, 'rb') as f:
+        data = f.read()
+
+    start = time.perf_counter()
+    frame_length = FRAME_LENGTHS.get(brand, 20)
+    frames = frames_from_stream(data, HEADERS[brand], frame_length, brand)
+    columns = decode_frames(frames, brand, frame_length)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"Pacchetti decodificati: {len(frames)} in {elapsed:.1f} ms")
+    for name, values in columns.items():
+        if len(values):
+            print(f"{name}: min {values.min():.2f}, max {values.max():.2f}, media {values.mean():.2f}")
+
+if __name__ == "__main__":
+    main()
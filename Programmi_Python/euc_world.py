@@ -0,0 +1,104 @@
+import csv
+import numpy as np
+import log_cache
+
+
+class EucWorldLog:
+    """
+    Log CSV di EUC World in colonne: una riga per ogni riga del CSV con timestamp valido.
+
+    Attributes:
+        header (list): Nomi delle colonne del CSV.
+        timestamps (np.ndarray): Millisecondi dall'epoca (int64) dell'ora scritta nel CSV, senza
+            applicare l'offset "+0200" (come negli script di analisi).
+        values (np.ndarray): Valori numerici (float64, righe x colonne); NaN se vuoti o non numerici.
+        lines (np.ndarray): Numero di riga nel file, da 1 (int32).
+    """
+
+    def __init__(self, header, timestamps, values, lines):
+        self.header = header
+        self.timestamps = timestamps
+        self.values = values
+        self.lines = lines
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def column(self, index):
+        """Colonna index del CSV (float64), indicata per posizione o per nome."""
+        if isinstance(index, str):
+            index = self.header.index(index)
+        return self.values[:, index]
+
+
+def _to_float(cells):
+    """
+    Converte una colonna di stringhe in float64 in blocco; NaN per le celle vuote o non numeriche.
+    Una colonna la cui prima cella non vuota non è un numero (es. gps_datetime) è testuale: tutta NaN.
+    """
+    cells = [cell or "nan" for cell in cells]
+    try:
+        return np.array(cells, dtype=np.float64)
+    except ValueError:
+        pass
+    values = np.full(len(cells), np.nan)
+    first = next((cell for cell in cells if cell != "nan"), "nan")
+    try:
+        float(first)
+    except ValueError:
+        return values
+    for i, cell in enumerate(cells):
+        try:
+            values[i] = float(cell)
+        except ValueError:
+            pass
+    return values
+
+
+def _parse(csv_file):
+    """Parsa il CSV in colonne NumPy (vedi EucWorldLog)."""
+    with open(csv_file, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        rows = list(reader)
+    width = len(header)
+    # Righe corte completate con celle vuote, righe lunghe troncate all'intestazione
+    rows = [row[:width] if len(row) >= width else row + [""] * (width - len(row)) for row in rows]
+    stamps = [row[0].split('+')[0] if row else "" for row in rows]
+    try:
+        timestamps = np.array(stamps, dtype="datetime64[ms]")
+    except ValueError:
+        timestamps = np.empty(len(stamps), dtype="datetime64[ms]")
+        for i, stamp in enumerate(stamps):
+            try:
+                timestamps[i] = np.datetime64(stamp, "ms") if "T" in stamp else np.datetime64("NaT")
+            except ValueError:
+                timestamps[i] = np.datetime64("NaT")
+    valid = ~np.isnat(timestamps)
+    lines = (np.flatnonzero(valid) + 2).astype(np.int32)  # Riga 1: intestazione
+    if rows:
+        cells = list(zip(*rows))
+        values = np.column_stack([_to_float(column) for column in cells])[valid]
+    else:
+        values = np.empty((0, width))
+    return {
+        "header": np.array(header),
+        "timestamps": timestamps[valid].astype(np.int64),
+        "values": values,
+        "lines": lines
+    }
+
+
+def load_euc_world_csv(csv_file, use_cache=True):
+    """
+    Carica un log CSV di EUC World, dalla cache di log_cache se il file non è cambiato.
+
+    Args:
+        csv_file (str): Percorso del file CSV.
+        use_cache (bool): False per parsare sempre il file.
+
+    Returns:
+        EucWorldLog: Colonne del log.
+    """
+    columns = log_cache.cached(csv_file, "eucworld", _parse, use_cache=use_cache)
+    return EucWorldLog(columns["header"].tolist(), columns["timestamps"], columns["values"], columns["lines"])
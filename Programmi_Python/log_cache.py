@@ -0,0 +1,124 @@
+import hashlib
+import os
+import zipfile
+import numpy as np
+
+# Cache su disco dei log già parsati: un file .npz per sorgente, nella cartella indicata da
+# EUC_CACHE_DIR (default .cache accanto agli script). Un file della cache è valido finché la
+# sorgente ha la stessa dimensione e data di modifica; se cambia solo la data (es. file copiato)
+# si confronta l'hash del contenuto prima di riparsare.
+CACHE_DIR = os.environ.get("EUC_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+CACHE_MAX_BYTES = int(os.environ.get("EUC_CACHE_MAX_MB", "256")) * 1024 * 1024
+_VERSION = 1  # Da incrementare quando cambia il formato delle colonne salvate
+_HASH_BLOCK = 1 << 20
+
+
+def file_hash(path):
+    """Hash BLAKE2b (hex) del contenuto del file, letto a blocchi."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(path, kind, params=()):
+    """File della cache per la sorgente path parsata come kind con i parametri params."""
+    key = repr((_VERSION, os.path.abspath(path), kind, tuple(params))).encode()
+    name = f"{kind}-{hashlib.blake2b(key, digest_size=10).hexdigest()}.npz"
+    return os.path.join(CACHE_DIR, name)
+
+
+def load(path, kind, params=()):
+    """
+    Colonne salvate per la sorgente path, se ancora valide.
+
+    Returns:
+        dict: {nome: np.ndarray}, o None se la cache manca o non corrisponde più alla sorgente.
+    """
+    entry = cache_path(path, kind, params)
+    try:
+        stat = os.stat(path)
+        with np.load(entry, allow_pickle=False) as data:
+            columns = {name: data[name] for name in data.files}
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None  # Cache assente, illeggibile o troncata: si riparsa
+    size, mtime = columns.pop("_size"), columns.pop("_mtime")
+    digest = str(columns.pop("_hash"))
+    if size != stat.st_size:
+        return None
+    if mtime != stat.st_mtime_ns:
+        if digest != file_hash(path):
+            return None
+        store(path, kind, params, columns, digest)  # Stesso contenuto: si aggiorna solo la data
+    else:
+        os.utime(entry)  # Usato di recente: è l'ultimo a essere eliminato
+    return columns
+
+
+def store(path, kind, params, columns, digest=None):
+    """
+    Salva le colonne parsate dalla sorgente path e riporta la cartella entro CACHE_MAX_BYTES.
+    Un errore di scrittura non interrompe l'analisi: la cache viene semplicemente saltata.
+    """
+    entry = cache_path(path, kind, params)
+    temporary = f"{entry}.{os.getpid()}.tmp"
+    try:
+        stat = os.stat(path)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(temporary, "wb") as f:
+            np.savez(f, _size=stat.st_size, _mtime=stat.st_mtime_ns, _hash=digest or file_hash(path), **columns)
+        os.replace(temporary, entry)  # Scrittura atomica: un'altra esecuzione non legge mai un file a metà
+        prune(keep=entry)
+    except OSError as e:
+        print(f"Avviso: impossibile salvare la cache {entry}: {e}")
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+
+
+def prune(max_bytes=None, keep=None):
+    """Elimina i file della cache usati meno di recente finché la cartella non supera max_bytes."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        entries = [entry for entry in os.scandir(CACHE_DIR) if entry.name.endswith(".npz")]
+    except OSError:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    total = sum(entry.stat().st_size for entry in entries)
+    for entry in entries:
+        if total <= max_bytes:
+            break
+        if entry.path == keep:
+            continue
+        size = entry.stat().st_size
+        try:
+            os.remove(entry.path)
+            total -= size
+        except OSError:
+            pass
+
+
+def cached(path, kind, build, params=(), use_cache=True):
+    """
+    Restituisce le colonne di path dalla cache, o le calcola con build(path) e le salva.
+
+    Args:
+        path (str): File sorgente.
+        kind (str): Tipo di parsing (es. 'nrf', 'eucworld'), parte della chiave.
+        build (callable): Funzione che parsa path e restituisce {nome: np.ndarray}.
+        params (tuple): Parametri del parsing che cambiano il risultato, parte della chiave.
+        use_cache (bool): False per parsare sempre senza leggere né scrivere la cache.
+
+    Returns:
+        dict: {nome: np.ndarray}.
+    """
+    if use_cache:
+        columns = load(path, kind, params)
+        if columns is not None:
+            return columns
+    columns = build(path)
+    if use_cache:
+        store(path, kind, params, columns)
+    return columns
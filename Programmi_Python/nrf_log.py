@@ -0,0 +1,327 @@
+import mmap
+import os
+import re
+from datetime import datetime, timedelta
+import numpy as np
+import log_cache
+
+# Una riga con timestamp ha forma fissa "L\tHH:MM:SS.mmm\tMessaggio": le righe si riconoscono
+# dai separatori alle posizioni note, senza regex riga per riga
+_SEPARATORS = ((1, 9), (4, 58), (7, 58), (10, 46), (14, 9))  # (posizione, carattere)
+_DIGITS = np.array([2, 3, 5, 6, 8, 9, 11, 12, 13])  # Cifre di HH, MM, SS e mmm
+_MESSAGE = 15
+_VALUE = re.compile(rb'\(0x\) ?([0-9A-Fa-f-]*)')  # Valore "(0x) AA-BB-..."
+# UUID " xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx," prima del valore: trattini e cifre alle posizioni
+# note rispetto alla virgola finale
+_UUID_DASHES = np.array([-28, -23, -18, -13])
+_UUID_DIGITS = np.setdiff1d(np.arange(-36, 0), _UUID_DASHES)
+_HEX_VALUE = np.full(256, 255, dtype=np.uint8)  # Valore delle cifre esadecimali, 255 per gli altri byte
+_HEX_VALUE[np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)] = np.arange(16)
+_HEX_VALUE[np.frombuffer(b"abcdef", dtype=np.uint8)] = np.arange(10, 16)
+_HEX_DIGIT = _HEX_VALUE != 255
+_DATE = re.compile(rb'(\d{4}-\d{2}-\d{2})')
+
+# Tipo di evento, dalle prime 4 lettere del messaggio
+NOTIFY = 0  # Notification/Indication received
+READ = 1  # Read Response received
+WRITE = 2  # Data written
+OTHER = 3
+_KINDS = ((b"Noti", NOTIFY), (b"Indi", NOTIFY), (b"Read", READ), (b"Data", WRITE))
+
+_DAY_MS = 86400000
+
+# Byte letti dall'inizio del file per riconoscere un log vuoto o con solo "null"
+_HEAD = 4096
+_NULL_SIZE = 100
+_BLOCK = 1 << 20  # Byte confrontati per volta: le maschere temporanee non crescono con il file
+
+
+class NrfLog:
+    """
+    Log nRF Connect in colonne compatte, una riga per ogni riga con timestamp.
+
+    Attributes:
+        date (str): Data del log, o None se sconosciuta.
+        levels (np.ndarray): Livello della riga come codice ASCII (uint8, es. ord('I')).
+        timestamps (np.ndarray): Millisecondi dall'epoca Unix (int64), in UTC se indicato l'offset;
+            millisecondi dalla mezzanotte se la data è sconosciuta.
+        kinds (np.ndarray): Tipo di evento (NOTIFY, READ, WRITE, OTHER).
+        chars (np.ndarray): Indice in characteristics dell'UUID della riga, -1 se assente (int16).
+        characteristics (list): UUID delle caratteristiche in minuscolo, in ordine di apparizione.
+        payloads (bytes): Valori "(0x)" di tutte le righe, concatenati.
+        offsets (np.ndarray): Inizio del valore di ogni riga in payloads (int64, len + 1 elementi).
+        lines (np.ndarray): Numero di riga nel file, da 1 (int32).
+        line_count (int): Righe totali del file, comprese quelle senza timestamp.
+        source: Contenuto del log (bytes o mmap del file, letto solo per line()).
+    """
+
+    def __init__(self, source, date, levels, timestamps, kinds, chars, characteristics, payloads, offsets, lines, starts,
+                 line_count=0):
+        self.source = source
+        self.date = date
+        self.levels = levels
+        self.timestamps = timestamps
+        self.kinds = kinds
+        self.chars = chars
+        self.characteristics = characteristics
+        self.payloads = payloads
+        self.offsets = offsets
+        self.lines = lines
+        self._starts = starts
+        self.line_count = line_count
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def lengths(self):
+        """Lunghezza in byte del valore di ogni riga."""
+        return np.diff(self.offsets)
+
+    def select(self, mask):
+        """
+        Sottoinsieme delle righe indicate da mask, con i valori ricompattati in un nuovo buffer.
+
+        Args:
+            mask (np.ndarray): Array booleano lungo quanto il log, o indici delle righe.
+
+        Returns:
+            NrfLog: Nuovo log con le sole righe selezionate.
+        """
+        rows = np.flatnonzero(mask) if np.asarray(mask).dtype == bool else np.asarray(mask, dtype=np.int64)
+        lengths = self.offsets[rows + 1] - self.offsets[rows]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Posizione in payloads di ogni byte selezionato: inizio della riga più progressivo nella riga
+        positions = np.repeat(self.offsets[rows] - offsets[:-1], lengths) + np.arange(offsets[-1])
+        payloads = np.frombuffer(self.payloads, dtype=np.uint8)[positions].tobytes()
+        return NrfLog(self.source, self.date, self.levels[rows], self.timestamps[rows], self.kinds[rows],
+                      self.chars[rows], self.characteristics, payloads, offsets, self.lines[rows], self._starts[rows],
+                      self.line_count)
+
+    def payload(self, i):
+        """Valore della riga i, come memoryview su payloads (vuoto se la riga non ne ha)."""
+        return memoryview(self.payloads)[self.offsets[i]:self.offsets[i + 1]]
+
+    def char_id(self, uuid):
+        """Indice di uuid in characteristics (confronto senza maiuscole), -1 se non presente nel log."""
+        uuid = uuid.lower()
+        for i, name in enumerate(self.characteristics):
+            if name == uuid or name.startswith(uuid):
+                return i
+        return -1
+
+    def line(self, i):
+        """Testo completo della riga i, senza a capo."""
+        start = self._starts[i]
+        end = self.source.find(b"\n", start)
+        return self.source[start:end if end >= 0 else len(self.source)].rstrip().decode("utf-8", "replace")
+
+    def hex(self, i):
+        """Valore della riga i in esadecimale maiuscolo senza separatori (come nei vecchi script)."""
+        return self.payload(i).hex().upper()
+
+    def close(self):
+        """Chiude la mappatura del file, se presente; dopo la chiusura line() non è più disponibile."""
+        if isinstance(self.source, mmap.mmap):
+            self.source.close()
+
+
+def _find(raw, char):
+    """Posizioni (int64) dei byte uguali a char, cercate a blocchi."""
+    found = [np.flatnonzero(raw[i:i + _BLOCK] == char) + i for i in range(0, len(raw), _BLOCK)]
+    return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+
+def log_date(source, path=None):
+    """
+    Data del log: dall'intestazione "nRF Connect, AAAA-MM-GG" o, in mancanza, dal nome del file.
+
+    Returns:
+        str: Data (es. '2025-04-26'), o None se non trovata.
+    """
+    match = _DATE.search(source, 0, 200)
+    if match:
+        return match.group(1).decode()
+    if path:
+        match = _DATE.search(os.path.basename(path).encode())
+        if match:
+            return match.group(1).decode()
+    return None
+
+
+def parse_log(source, date=None, timezone_offset_hours=0, path=None):
+    """
+    Parsa in un solo passaggio il testo (bytes) di un log nRF Connect.
+
+    Args:
+        source (bytes | mmap.mmap): Contenuto del log; non ne viene fatta nessuna copia.
+        date (str): Data del log (es. '2025-04-26'); se None viene letta dall'intestazione o da path.
+            Se non si trova, i timestamp partono dalla mezzanotte del 1970-01-01 e NrfLog.date è None.
+        timezone_offset_hours (int): Offset del fuso orario del telefono, sottratto per ottenere UTC.
+        path (str): Percorso del file, usato solo per ricavare la data.
+
+    Returns:
+        NrfLog: Colonne del log. Lancia ValueError se un valore esadecimale è malformato.
+    """
+    date = date or log_date(source, path)
+
+    raw = np.frombuffer(source, dtype=np.uint8)
+    size = len(raw)
+    line_starts = np.concatenate(([0], _find(raw, 10) + 1))
+    line_count = len(line_starts) - (size == 0 or raw[-1] == 10)
+    # Righe con timestamp: abbastanza lunghe, livello maiuscolo e separatori al loro posto
+    candidates = np.flatnonzero(line_starts + _MESSAGE <= size)
+    starts = line_starts[candidates]
+    mask = (raw[starts] >= 65) & (raw[starts] <= 90)
+    for position, char in _SEPARATORS:
+        mask &= raw[starts + position] == char
+    candidates = candidates[mask]
+    starts = starts[mask]
+    count = len(starts)
+    lines = (candidates + 1).astype(np.int32)
+
+    digits = raw[starts[:, None] + _DIGITS].astype(np.int64) - 48
+    ms = (((digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 2] * 10 + digits[:, 3]) * 60
+          + digits[:, 4] * 10 + digits[:, 5]) * 1000 + digits[:, 6] * 100 + digits[:, 7] * 10 + digits[:, 8]
+    # Log a cavallo della mezzanotte: ogni salto indietro di oltre 12 ore è un nuovo giorno
+    ms += np.cumsum(np.diff(ms, prepend=ms[:1]) < -_DAY_MS // 2) * _DAY_MS
+    epoch = np.datetime64(date or "1970-01-01", "ms").astype(np.int64) - timezone_offset_hours * 3600000
+    timestamps = ms + epoch
+
+    kinds = np.full(count, OTHER, dtype=np.uint8)
+    if count:
+        heads = raw[np.minimum(starts[:, None] + _MESSAGE + np.arange(4), size - 1)]
+        heads = np.ascontiguousarray(heads).view("S4").ravel()
+        for word, kind in _KINDS:
+            kinds[heads == word] = kind
+
+    # Ogni valore e UUID appartiene alla riga che lo contiene (il primo, se più d'uno)
+    def owners(positions):
+        rows = np.searchsorted(starts, positions, side="right") - 1
+        valid = rows >= 0
+        valid[valid] &= positions[valid] < np.append(starts[1:], size)[rows[valid]]
+        valid[valid] &= np.append(True, np.diff(rows[valid]) != 0)
+        return rows, valid
+
+    chars = np.full(count, -1, dtype=np.int16)
+    commas = _find(raw, 44)
+    commas = commas[commas >= 37]
+    found = raw[commas - 37] == 32
+    for offset in _UUID_DASHES:
+        found &= raw[commas + offset] == 45
+    commas = commas[found]
+    commas = commas[_HEX_DIGIT[raw[commas[:, None] + _UUID_DIGITS]].all(axis=1)]
+    rows, valid = owners(commas - 36)
+    uuids = np.ascontiguousarray(raw[(commas - 36)[valid, None] + np.arange(36)]).view("S36").ravel()
+    uuids = np.char.lower(uuids)
+    names, first, inverse = np.unique(uuids, return_index=True, return_inverse=True)
+    order = np.argsort(first)  # Caratteristiche in ordine di apparizione
+    rank = np.empty(len(order), dtype=np.int16)
+    rank[order] = np.arange(len(order))
+    chars[rows[valid]] = rank[inverse.ravel()]
+    characteristics = [name.decode() for name in names[order]]
+
+    # Tutti i valori in un'unica conversione; le posizioni di "(0x)" servono ad assegnarli alle righe
+    values = _VALUE.findall(source)
+    opens = _find(raw, 40)
+    opens = opens[opens + 3 < size]
+    opens = opens[(raw[opens + 1] == 48) & (raw[opens + 2] == 120) & (raw[opens + 3] == 41)]
+    lengths = np.zeros(count, dtype=np.int64)
+    hexes = [b""] * count
+    if values:
+        rows, valid = owners(opens)
+        for row, value in zip(rows[valid].tolist(), [v for v, ok in zip(values, valid.tolist()) if ok]):
+            hexes[row] = value
+        lengths[rows[valid]] = (np.fromiter(map(len, values), dtype=np.int64, count=len(values))[valid] + 1) // 3
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    # Conversione esadecimale a colonne: si tolgono i trattini e si combinano le cifre a coppie
+    nibbles = np.frombuffer(b"".join(hexes), dtype=np.uint8)
+    nibbles = _HEX_VALUE[nibbles[nibbles != 45]]
+    if len(nibbles) != 2 * offsets[-1]:
+        raise ValueError("Valore esadecimale malformato nel log.")
+    payloads = (nibbles[0::2] << 4 | nibbles[1::2]).tobytes()
+
+    return NrfLog(source, date, raw[starts], timestamps, kinds, chars, characteristics, payloads, offsets, lines, starts,
+                  line_count)
+
+
+def log_status(path):
+    """
+    Controlla solo l'inizio del file per riconoscere un log vuoto o che contiene solo "null".
+
+    Args:
+        path (str): Percorso del file.
+
+    Returns:
+        str: 'vuoto', 'null', o None se il log ha contenuto utile.
+    """
+    with open(path, "rb") as f:
+        head = f.read(_HEAD)
+    if len(head) == _HEAD:
+        return None  # Un log con solo "null" è lungo pochi byte
+    head = head.strip()
+    if not head:
+        return "vuoto"
+    if b"null" in head.lower() and len(head) < _NULL_SIZE:
+        return "null"
+    return None
+
+
+def map_log(path):
+    """
+    Mappa in memoria (sola lettura) un file di log, senza leggerlo: le pagine vengono caricate dal
+    sistema operativo solo quando il parser le scorre.
+
+    Returns:
+        mmap.mmap | bytes: Mappatura del file, o b"" se il file è vuoto (non mappabile).
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _columns(log):
+    """Colonne di log da salvare nella cache (solo array NumPy, senza oggetti Python)."""
+    return {
+        "date": np.array(log.date or ""),
+        "levels": log.levels,
+        "timestamps": log.timestamps,
+        "kinds": log.kinds,
+        "chars": log.chars,
+        "characteristics": np.array(log.characteristics, dtype="U36"),
+        "payloads": np.frombuffer(log.payloads, dtype=np.uint8),
+        "offsets": log.offsets,
+        "lines": log.lines,
+        "starts": log._starts,
+        "line_count": np.array(log.line_count)
+    }
+
+
+def parse_nrf_log(path, date=None, timezone_offset_hours=0, use_cache=True):
+    """
+    Parsa un file di log nRF Connect mappato in memoria (vedi parse_log e map_log).
+    Le colonne vengono salvate nella cache di log_cache: le esecuzioni successive sullo stesso
+    file le ricaricano senza riparsare.
+
+    Args:
+        path (str): Percorso del file.
+        date (str): Data del log, se non ricavabile da intestazione o nome del file.
+        timezone_offset_hours (int): Offset del fuso orario del telefono (es. 2 per CEST).
+        use_cache (bool): False per parsare sempre il file.
+
+    Returns:
+        NrfLog: Colonne del log.
+    """
+    source = map_log(path)
+    columns = log_cache.cached(path, "nrf", lambda path: _columns(parse_log(source, date, timezone_offset_hours, path)),
+                               (date, timezone_offset_hours), use_cache)
+    return NrfLog(source, str(columns["date"]) or None, columns["levels"], columns["timestamps"], columns["kinds"],
+                  columns["chars"], columns["characteristics"].tolist(), columns["payloads"].tobytes(),
+                  columns["offsets"], columns["lines"], columns["starts"], int(columns["line_count"]))
+
+
+def to_datetime(ms):
+    """Converte un timestamp in millisecondi dall'epoca in datetime (senza fuso orario)."""
+    return datetime(1970, 1, 1) + timedelta(milliseconds=int(ms))
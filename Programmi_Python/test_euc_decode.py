@@ -0,0 +1,39 @@
+import numpy as np
+from euc_decode import decode_frames, frames_from_stream, HEADERS
+
+def ninebot_frame(response_type, speed, corrupt=False):
+    frame = bytearray(20)
+    frame[0:2] = HEADERS["Ninebot"]
+    frame[2] = response_type
+    frame[4:6] = speed.to_bytes(2, "big")
+    frame[6:8] = (6000).to_bytes(2, "big")
+    frame[19] = (sum(frame[:19]) + corrupt) & 0xFF
+    return bytes(frame)
+
+def gotway_frame(response_type, voltage):
+    frame = bytearray(20)
+    frame[0:2] = HEADERS["Gotway"]
+    frame[2:4] = voltage.to_bytes(2, "big")
+    frame[16] = response_type
+    return bytes(frame)
+
+def test_ninebot_mixed_stream():
+    # Dati live, numero di serie, pacchetto con checksum errata e byte spuri
+    stream = (b"\x00\x5a" + ninebot_frame(0x01, 100) + ninebot_frame(0x03, 999)
+              + ninebot_frame(0x01, 777, corrupt=True) + b"junk" + ninebot_frame(0x01, 200))
+    frames = frames_from_stream(stream, HEADERS["Ninebot"], 20, "Ninebot")
+    columns = decode_frames(frames, "Ninebot")
+    assert np.allclose(columns["speed"], [1.0, 2.0])
+
+def test_corrupt_frame_does_not_hide_next():
+    # Un header spurio con checksum errata sovrapposto a un pacchetto valido
+    stream = ninebot_frame(0x01, 777, corrupt=True)[:10] + ninebot_frame(0x01, 300)
+    frames = frames_from_stream(stream, HEADERS["Ninebot"], 20, "Ninebot")
+    assert np.allclose(decode_frames(frames, "Ninebot")["speed"], [3.0])
+
+def test_gotway_skips_serial_and_firmware():
+    stream = gotway_frame(0x04, 672) + gotway_frame(0x1B, 1234) + gotway_frame(0x1A, 1) + gotway_frame(0x04, 650)
+    frames = frames_from_stream(stream, HEADERS["Gotway"], 20, "Gotway")
+    assert np.allclose(decode_frames(frames, "Gotway")["voltage"], [67.2, 65.0])
+    # Anche su un buffer già allineato decode_frames tiene solo i dati live
+    assert np.allclose(decode_frames(stream, "Gotway")["voltage"], [67.2, 65.0])
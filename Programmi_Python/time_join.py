@@ -0,0 +1,108 @@
+import numpy as np
+
+# Join temporali tra serie di timestamp in millisecondi (int64), con ricerca binaria.
+# La serie di destra (es. i pacchetti BLE) deve essere ordinata in modo crescente; quella di
+# sinistra (es. le righe CSV) può avere qualsiasi ordine. Costo O((n + m) log m).
+
+BACKWARD = "backward"  # Ultimo timestamp di destra <= quello di sinistra
+FORWARD = "forward"  # Primo timestamp di destra >= quello di sinistra
+NEAREST = "nearest"  # Il più vicino dei due (a parità, quello precedente)
+
+
+def window_bounds(left, right, before_ms=0, after_ms=0):
+    """
+    Intervallo di elementi di right compresi in [t - before_ms, t + after_ms] per ogni t di left.
+
+    Args:
+        left (np.ndarray): Timestamp di riferimento in ms.
+        right (np.ndarray): Timestamp da associare in ms, crescenti.
+        before_ms (int): Ampiezza della finestra prima di ogni timestamp di left.
+        after_ms (int): Ampiezza della finestra dopo ogni timestamp di left.
+
+    Returns:
+        tuple: (first, last): gli elementi di right associati a left[i] sono right[first[i]:last[i]].
+    """
+    left = np.asarray(left, dtype=np.int64)
+    first = np.searchsorted(right, left - before_ms, side="left")
+    last = np.searchsorted(right, left + after_ms, side="right")
+    return first, np.maximum(last, first)
+
+
+def join_window(left, right, before_ms=0, after_ms=0):
+    """
+    Tutte le coppie (i, j) con right[j] nella finestra [left[i] - before_ms, left[i] + after_ms].
+
+    Returns:
+        tuple: (left_index, right_index), array int64 ordinati per left_index e poi per right_index.
+    """
+    first, last = window_bounds(left, right, before_ms, after_ms)
+    counts = last - first
+    left_index = np.repeat(np.arange(len(first)), counts)
+    # Indici di right di ogni coppia: inizio della finestra più progressivo nella finestra
+    right_index = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return left_index, right_index
+
+
+def join_nearest(left, right, tolerance_ms=None, direction=NEAREST):
+    """
+    Per ogni timestamp di left, l'indice dell'elemento di right più vicino nella direzione indicata
+    (come un merge-asof).
+
+    Args:
+        left (np.ndarray): Timestamp di riferimento in ms.
+        right (np.ndarray): Timestamp da associare in ms, crescenti.
+        tolerance_ms (int): Distanza massima ammessa, o None per nessun limite.
+        direction (str): BACKWARD, FORWARD o NEAREST.
+
+    Returns:
+        np.ndarray: Indice in right per ogni elemento di left (int64), -1 se nessuno è associabile.
+    """
+    if direction not in (BACKWARD, FORWARD, NEAREST):
+        raise ValueError(f"Direzione non valida: {direction}")
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+    size = len(right)
+    if not size:
+        return np.full(len(left), -1, dtype=np.int64)
+    # Precedente: ultimo <= t; successivo: primo >= t
+    previous = np.searchsorted(right, left, side="right") - 1
+    following = np.searchsorted(right, left, side="left")
+    has_previous = previous >= 0
+    has_following = following < size
+    if direction == BACKWARD:
+        index, found = previous, has_previous
+    elif direction == FORWARD:
+        index, found = following, has_following
+    else:
+        gap_previous = np.where(has_previous, left - right[np.clip(previous, 0, None)], np.iinfo(np.int64).max)
+        gap_following = np.where(has_following, right[np.clip(following, None, size - 1)] - left,
+                                 np.iinfo(np.int64).max)
+        index = np.where(gap_previous <= gap_following, previous, following)
+        found = has_previous | has_following
+    index = np.where(found, index, -1)
+    if tolerance_ms is not None:
+        gap = np.abs(right[np.clip(index, 0, None)] - left)
+        index[(index >= 0) & (gap > tolerance_ms)] = -1
+    return index
+
+
+def interval_groups(timestamps, interval_ms):
+    """
+    Raggruppa timestamp crescenti in intervalli: un gruppo inizia dal primo timestamp più lontano
+    di interval_ms dall'inizio del gruppo precedente. Un salto con ricerca binaria per gruppo.
+
+    Args:
+        timestamps (np.ndarray): Timestamp in ms, crescenti.
+        interval_ms (int): Ampiezza massima di un gruppo.
+
+    Returns:
+        np.ndarray: Timestamp di inizio del gruppo di ogni elemento (int64).
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    firsts = []
+    i = 0
+    while i < len(timestamps):
+        firsts.append(i)
+        i = int(np.searchsorted(timestamps, timestamps[i] + interval_ms, side="right"))
+    firsts = np.array(firsts, dtype=np.int64)
+    return np.repeat(timestamps[firsts], np.diff(np.append(firsts, len(timestamps))))